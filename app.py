@@ -14,8 +14,7 @@ from flask_cors import CORS
 
 from utils.langgraph_agent import CLAMSAgent
 from utils.agui_integration import AGUIServer, AGUIEvent, AGUIEventType
-from utils.pipeline_model import PipelineStore
-from utils.clams_tools import CLAMSToolbox
+from utils.clams_tools import get_toolbox
 from utils.config import ConfigManager
 
 # Configure logging
@@ -46,8 +45,7 @@ try:
     config_manager = ConfigManager()
     agent = CLAMSAgent(config_manager=config_manager)
     agui_server = AGUIServer(agent)
-    pipeline_store = PipelineStore(storage_dir="data/pipelines")
-    toolbox = CLAMSToolbox()
+    toolbox = get_toolbox()
     
     logger.info("Successfully initialized CLAMS agent and AG-UI server")
     logger.info(f"Using LLM provider: {config_manager.get_config().llm.provider}")
@@ -101,8 +99,9 @@ def get_tools():
 def get_pipelines():
     """Get all available pipelines."""
     try:
-        if pipeline_store:
-            pipelines = pipeline_store.list_pipelines()
+        if agent:
+            # The store (and its directory) is created on first use
+            pipelines = agent.pipeline_store.list_pipelines()
             return jsonify(pipelines)
         return jsonify([])
     except Exception as e:
@@ -114,8 +113,8 @@ def get_pipelines():
 def get_pipeline(name):
     """Get a specific pipeline by name."""
     try:
-        if pipeline_store:
-            pipeline = pipeline_store.load_pipeline(name)
+        if agent:
+            pipeline = agent.pipeline_store.load_pipeline(name)
             return jsonify(pipeline.to_dict())
         return jsonify({"error": "Pipeline store not available"}), 500
     except FileNotFoundError:
@@ -128,79 +127,100 @@ def get_pipeline(name):
 # Create a global event loop for handling async operations
 import threading
 import queue
+import concurrent.futures
 
-# Global thread for async operations
+# Shared event loop running in a dedicated thread. Requests are scheduled onto
+# it concurrently, so one session's LLM round-trip doesn't queue the others.
+async_loop = None
 async_thread = None
-async_queue = queue.Queue()
-async_results = {}
-result_counter = 0
+async_thread_lock = threading.Lock()
+request_semaphore = None
+
+# Upper bound on agent requests in flight (e.g. to stay under the provider's rate limit)
+MAX_CONCURRENT_REQUESTS = int(os.getenv('CLAMS_MAX_CONCURRENT_REQUESTS', 8))
 
 def start_async_thread():
     """Start the dedicated async thread for handling events."""
-    global async_thread
-    if async_thread is None:
-        async_thread = threading.Thread(target=async_worker, daemon=True)
-        async_thread.start()
-        logger.info("Started dedicated async worker thread")
+    global async_loop, async_thread
+    with async_thread_lock:
+        if async_thread is None:
+            async_loop = asyncio.new_event_loop()
+            async_thread = threading.Thread(target=async_worker, daemon=True)
+            async_thread.start()
+            logger.info("Started dedicated async worker thread")
 
 def async_worker():
     """Worker function for the async thread."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    asyncio.set_event_loop(async_loop)
     
     try:
-        while True:
-            try:
-                # Get task from queue
-                task_id, coro = async_queue.get(timeout=1.0)
-                
-                # Execute coroutine with timeout protection
-                try:
-                    result = loop.run_until_complete(asyncio.wait_for(coro, timeout=300.0))
-                    async_results[task_id] = {"result": result, "error": None}
-                except asyncio.TimeoutError:
-                    async_results[task_id] = {"result": None, "error": "Task timed out after 300 seconds"}
-                    logger.error(f"Async task {task_id} timed out")
-                except Exception as e:
-                    async_results[task_id] = {"result": None, "error": str(e)}
-                    logger.error(f"Async task {task_id} failed: {e}")
-                
-            except queue.Empty:
-                continue
-                
+        async_loop.run_forever()
     except Exception as e:
         logger.error(f"Async worker thread failed: {e}")
     finally:
-        loop.close()
+        async_loop.close()
+
+async def _run_limited(coro):
+    """Run a coroutine on the shared loop, bounded by MAX_CONCURRENT_REQUESTS."""
+    global request_semaphore
+    if request_semaphore is None:
+        request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    async with request_semaphore:
+        return await coro
 
 def run_async_task(coro, timeout=120.0):
     """Run an async task in the dedicated thread and wait for result."""
-    global result_counter
-    
     # Ensure async thread is running
     start_async_thread()
     
-    # Generate unique task ID
-    task_id = f"task_{result_counter}"
-    result_counter += 1
+    future = asyncio.run_coroutine_threadsafe(_run_limited(coro), async_loop)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Async task timed out after {timeout}s")
+
+def iter_async_task(agen, timeout=120.0, limited=True):
+    """
+    Iterate an async generator in the dedicated thread, yielding items as they arrive.
     
-    # Submit task
-    async_queue.put((task_id, coro))
+    A timeout of None waits indefinitely. Long-lived streams (e.g. SSE
+    connections) should pass limited=False so they don't hold one of the
+    MAX_CONCURRENT_REQUESTS slots for their whole lifetime.
+    """
+    start_async_thread()
     
-    # Wait for result
-    import time
-    start_time = time.time()
-    while task_id not in async_results:
-        if time.time() - start_time > timeout:
-            raise TimeoutError(f"Async task {task_id} timed out after {timeout}s")
-        time.sleep(0.1)
+    items = queue.Queue()
+    done = object()
     
-    # Get result
-    result_data = async_results.pop(task_id)
-    if result_data["error"]:
-        raise Exception(result_data["error"])
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(done)
     
-    return result_data["result"]
+    coro = _run_limited(pump()) if limited else pump()
+    future = asyncio.run_coroutine_threadsafe(coro, async_loop)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                item = items.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"Async task timed out after {timeout}s")
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop the producer if the client went away or we timed out
+        if not future.done():
+            future.cancel()
 
 # Modern AG-UI endpoints
 @app.route('/api/agui/session/<session_id>/welcome', methods=['POST'])
@@ -263,8 +283,9 @@ def handle_agui_event():
         try:
             event_json = json.dumps(event_data)
             
-            # Use asyncio.run() for simpler execution
-            response_events = asyncio.run(agui_server.process_user_event(event_json))
+            # Run on the shared loop so the agent's graph and checkpointer stay on one loop.
+            # No timeout: an agent turn that calls tools can legitimately run for minutes.
+            response_events = run_async_task(agui_server.process_user_event(event_json), timeout=None)
             
             # Convert events to JSON-serializable format
             events_data = []
@@ -297,40 +318,17 @@ def stream_agui_events(session_id):
     if not agui_server:
         return jsonify({"error": "AG-UI server not available"}), 503
     
-    async def event_generator():
-        """Generate SSE events."""
-        try:
-            async for event in agui_server.handle_sse_connection(session_id):
-                yield event
-        except Exception as e:
-            logger.error(f"Error in SSE stream: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'data': {'error': str(e)}})}\n\n"
-    
     def sync_generator():
         """Synchronous wrapper for async generator."""
         try:
-            # Use asyncio.run() like the working POST endpoint
-            async def run_generator():
-                events = []
-                try:
-                    async for event in agui_server.handle_sse_connection(session_id):
-                        events.append(event)
-                        if len(events) >= 50:  # Prevent memory issues with too many events
-                            break
-                except Exception as e:
-                    logger.error(f"Error in SSE async generator: {e}")
-                    error_event = f"data: {json.dumps({'type': 'error', 'data': {'error': str(e)}})}\\n\\n"
-                    events.append(error_event)
-                return events
-            
-            # Use asyncio.run() instead of the complex worker thread system
-            events = asyncio.run(run_generator())
-            for event in events:
+            # Forward events as they are queued; the connection stays open until the client leaves
+            for event in iter_async_task(agui_server.handle_sse_connection(session_id),
+                                         timeout=None, limited=False):
                 yield event
                 
         except Exception as e:
             logger.error(f"Error in sync generator: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'data': {'error': str(e)}})}\\n\\n"
+            yield f"data: {json.dumps({'type': 'error', 'data': {'error': str(e)}})}\n\n"
     
     return Response(sync_generator(), 
                    mimetype='text/event-stream',
@@ -385,15 +383,14 @@ def stream_chat_response():
         
         def sync_chat_generator():
             """Synchronous wrapper for async chat generator."""
-            # Use the dedicated async thread instead of creating new loops
+            # Forward each update as soon as the shared loop produces it
             try:
-                # Collect all chat updates using the dedicated thread
                 async def run_chat():
-                    updates = []
                     async for update in agent.stream_response(
                         user_input=user_message,
                         task_description=task_description,
-                        thread_id=session_id
+                        thread_id=session_id,
+                        stream_tokens=True
                     ):
                         # Convert to SSE format
                         event_data = {
@@ -401,15 +398,10 @@ def stream_chat_response():
                             'content': update.content,
                             'timestamp': update.timestamp
                         }
-                        updates.append(f"data: {json.dumps(event_data)}\\n\\n")
-                        if len(updates) >= 100:  # Prevent memory issues
-                            break
-                    return updates
+                        yield f"data: {json.dumps(event_data)}\n\n"
                 
-                # Get all updates and yield them with longer timeout
-                updates = run_async_task(run_chat(), timeout=180.0)
-                for update in updates:
-                    yield update
+                for event in iter_async_task(run_chat(), timeout=180.0):
+                    yield event
                     
             except Exception as e:
                 logger.error(f"Error in sync chat generator: {e}")
@@ -418,7 +410,7 @@ def stream_chat_response():
                     'content': {'error': str(e)},
                     'timestamp': str(time.time())
                 }
-                yield f"data: {json.dumps(error_data)}\\n\\n"
+                yield f"data: {json.dumps(error_data)}\n\n"
         
         return Response(sync_chat_generator(),
                        mimetype='text/event-stream',
@@ -458,9 +450,9 @@ def send_chat_message():
                 thread_id=session_id
             )
         
-        # Run async operation with simpler approach
+        # Run on the shared event loop so concurrent chats overlap; same limit as /api/chat/stream
         try:
-            response = asyncio.run(get_response())
+            response = run_async_task(get_response(), timeout=180.0)
             return jsonify({
                 "response": response.get("content", ""),
                 "tool_calls": response.get("tool_calls", []),
@@ -532,7 +524,7 @@ def health_check():
             "agent_available": agent is not None,
             "agui_server_available": agui_server is not None,
             "toolbox_available": toolbox is not None,
-            "pipeline_store_available": pipeline_store is not None
+            "pipeline_store_available": agent is not None
         }
         
         if agent:
@@ -1,7 +1,9 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
-from utils.download_app_directory import get_app_metadata, fetch_app_metadata
+import os
+import tempfile
+from utils.download_app_directory import get_app_metadata, fetch_app_metadata, load_app_metadata
 
 class TestAppDirectory(unittest.TestCase):
     """Test cases for app directory functionality."""
@@ -188,5 +190,80 @@ class TestAppDirectory(unittest.TestCase):
         with self.assertRaises(json.JSONDecodeError):
             get_app_metadata()
 
+    @patch('utils.download_app_directory.get_app_metadata')
+    def test_load_app_metadata_uses_fresh_cache(self, mock_get_app_metadata):
+        """Test that a fresh local app directory is used without downloading."""
+        cached = {"swt-detection": {"latest_version": "v7.5", "metadata": {}}}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'app_directory.json')
+            with open(cache_path, 'w') as f:
+                json.dump(cached, f)
+            
+            result = load_app_metadata(cache_path, max_age=60)
+        
+        self.assertEqual(result, cached)
+        mock_get_app_metadata.assert_not_called()
+    
+    @patch('utils.download_app_directory.get_app_metadata')
+    def test_load_app_metadata_refreshes_stale_cache(self, mock_get_app_metadata):
+        """Test that a stale or missing local app directory is downloaded and saved."""
+        fresh = {"chyron-detection": {"latest_version": "v1.0", "metadata": {}}}
+        mock_get_app_metadata.return_value = fresh
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'app_directory.json')
+            with open(cache_path, 'w') as f:
+                json.dump({"old-app": {}}, f)
+            
+            result = load_app_metadata(cache_path, max_age=0)
+            with open(cache_path, 'r') as f:
+                saved = json.load(f)
+        
+        self.assertEqual(result, fresh)
+        self.assertEqual(saved, fresh)
+
+    @patch('utils.download_app_directory.get_app_metadata')
+    def test_load_app_metadata_falls_back_to_stale_cache(self, mock_get_app_metadata):
+        """Test that a failed download falls back to the stale cache and leaves it untouched."""
+        stale = {"old-app": {"latest_version": "v1.0", "metadata": {}}}
+        mock_get_app_metadata.side_effect = Exception("Network error")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'app_directory.json')
+            with open(cache_path, 'w') as f:
+                json.dump(stale, f)
+            
+            with self.assertLogs('utils.download_app_directory', level='WARNING'):
+                result = load_app_metadata(cache_path, max_age=0)
+            with open(cache_path, 'r') as f:
+                saved = json.load(f)
+        
+        self.assertEqual(result, stale)
+        self.assertEqual(saved, stale)
+    
+    @patch('utils.download_app_directory.get_app_metadata')
+    def test_load_app_metadata_falls_back_to_snapshot(self, mock_get_app_metadata):
+        """Test that a failed download with no cache falls back to the snapshot."""
+        snapshot = {"swt-detection": {"latest_version": "v7.5", "metadata": {}}}
+        mock_get_app_metadata.side_effect = Exception("Network error")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, 'cache', 'app_directory.json')
+            snapshot_path = os.path.join(tmp_dir, 'app_directory.json')
+            with open(snapshot_path, 'w') as f:
+                json.dump(snapshot, f)
+            
+            result = load_app_metadata(cache_path, max_age=0, snapshot_path=snapshot_path)
+            
+            self.assertFalse(os.path.exists(cache_path))
+        self.assertEqual(result, snapshot)
+    
+    @patch('requests.get')
+    def test_get_app_metadata_strict_rejects_partial_download(self, mock_get):
+        """Test that strict mode raises when an app's metadata cannot be fetched."""
+        index_response = MagicMock()
+        index_response.json.return_value = self.sample_app_directory
+        mock_get.side_effect = [index_response, Exception("Network error")]
+        
+        with self.assertRaises(RuntimeError):
+            get_app_metadata(strict=True)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,181 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import os
+import tempfile
+from utils import clams_tools
+from utils.clams_tools import CLAMSTool, CLAMSToolError, CLAMSToolbox, ToolMeta, parse_type_name, extract_types
+
+class TestClamsTools(unittest.TestCase):
+    """Test cases for CLAMS tool metadata handling."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        # Minimal app metadata in the shape returned by get_app_metadata
+        self.sample_app_metadata = {
+            "swt-detection": {
+                "latest_version": "v7.5",
+                "metadata": {
+                    "description": "Detects scenes with text.",
+                    "app_version": "v7.5",
+                    "input": [
+                        {"@type": "http://mmif.clams.ai/vocabulary/VideoDocument/v1", "required": True}
+                    ],
+                    "output": [
+                        {"@type": "http://mmif.clams.ai/vocabulary/TimeFrame/v5"},
+                        {"@type": "http://mmif.clams.ai/vocabulary/TimePoint/v4"}
+                    ],
+                    "parameters": []
+                }
+            },
+            "simple-timepoints-stitcher": {
+                "latest_version": "v4.0",
+                "metadata": {
+                    "description": "Stitches TimePoints into TimeFrames.",
+                    "input": [
+                        {"@type": "http://mmif.clams.ai/vocabulary/VideoDocument/v1"},
+                        {"@type": "http://mmif.clams.ai/vocabulary/TimePoint/v4"}
+                    ],
+                    "output": [
+                        {"@type": "http://mmif.clams.ai/vocabulary/TimeFrame/v5"}
+                    ],
+                    "parameters": []
+                }
+            }
+        }
+
+        self.toolbox = CLAMSToolbox(self.sample_app_metadata)
+
+    def test_parse_type_name(self):
+        """Test stripping of vocabulary prefixes and version segments."""
+        self.assertEqual(parse_type_name("http://mmif.clams.ai/vocabulary/TimeFrame/v5"), "TimeFrame")
+        self.assertEqual(parse_type_name("http://vocab.lappsgrid.org/Token"), "Token")
+
+    def test_extract_types_skips_non_dict_entries(self):
+        """Test that alternatives lists and entries without @type are ignored."""
+        type_list = [
+            {"@type": "http://mmif.clams.ai/vocabulary/AudioDocument/v1"},
+            [{"@type": "http://mmif.clams.ai/vocabulary/VideoDocument/v1"}],
+            {"required": True}
+        ]
+        self.assertEqual(extract_types(type_list), ["AudioDocument"])
+
+    def test_toolbox_loads_lazily(self):
+        """Test that the app directory is only loaded once tools are needed."""
+        with patch.object(clams_tools, 'load_app_metadata', return_value=self.sample_app_metadata) as load:
+            toolbox = CLAMSToolbox()
+            load.assert_not_called()
+
+            self.assertIn("swt-detection", toolbox.get_tools())
+            toolbox.get_tool("simple-timepoints-stitcher")
+            load.assert_called_once()
+
+    def test_tool_metadata(self):
+        """Test that tool metadata is frozen with clean and lowercased type names."""
+        meta = self.toolbox.tool_metadata["swt-detection"]
+
+        self.assertIsInstance(meta, ToolMeta)
+        self.assertEqual(meta.input_types, ("VideoDocument",))
+        self.assertEqual(meta.output_types, ("TimeFrame", "TimePoint"))
+        self.assertEqual(meta.output_types_lc, ("timeframe", "timepoint"))
+        self.assertEqual(meta.app_version, "v7.5")
+
+    def test_tool_metadata_is_read_only_and_interned(self):
+        """Test that shared metadata can't be mutated and repeated type names are one object."""
+        metadata = self.toolbox.tool_metadata
+
+        with self.assertRaises(TypeError):
+            metadata["new-tool"] = None
+        self.assertIs(metadata["swt-detection"].input_types[0],
+                      metadata["simple-timepoints-stitcher"].input_types[0])
+
+    def test_consumers_by_type(self):
+        """Test the input type -> consuming tools index."""
+        consumers = self.toolbox.consumers_by_type
+
+        self.assertEqual(consumers["videodocument"], {"swt-detection", "simple-timepoints-stitcher"})
+        self.assertEqual(consumers["timepoint"], {"simple-timepoints-stitcher"})
+        self.assertNotIn("timeframe", consumers)
+
+    def test_compatible_tools(self):
+        """Test the precomputed tool adjacency, including type conversions."""
+        compatible = self.toolbox.compatible_tools
+
+        # TimePoint output matches the stitcher's input directly
+        self.assertEqual(compatible["swt-detection"], ("simple-timepoints-stitcher",))
+        # TimeFrame output only feeds Alignment/TextDocument consumers, of which there are none
+        self.assertEqual(compatible["simple-timepoints-stitcher"], ())
+
+    def test_resolve_tool_name(self):
+        """Test case-insensitive lookup of LLM-written tool names."""
+        self.assertEqual(self.toolbox.resolve_tool_name("swt-detection"), "swt-detection")
+        self.assertEqual(self.toolbox.resolve_tool_name(" SWT-Detection"), "swt-detection")
+        self.assertIsNone(self.toolbox.resolve_tool_name("ocr"))
+
+    @patch.dict(clams_tools._app_directories, clear=True)
+    def test_app_directory_lookup_is_cached(self):
+        """Test that a found app directory is reused and misses are retried."""
+        with patch.object(CLAMSTool, '_search_app_directory', side_effect=[None, '/apps/app-swt-detection']) as search:
+            tool = self.toolbox.get_tool("swt-detection")
+
+            self.assertIsNone(tool._find_app_directory())
+            self.toolbox.prewarm("swt-detection")
+            self.assertEqual(tool._find_app_directory(), '/apps/app-swt-detection')
+            self.assertEqual(search.call_count, 2)
+
+    def test_uses_gpu(self):
+        """Test GPU detection from app metadata and the CLAMS_GPU_TOOLS override."""
+        self.sample_app_metadata["swt-detection"]["metadata"]["est_gpu_mem_min"] = 4000
+        toolbox = CLAMSToolbox(self.sample_app_metadata)
+
+        self.assertTrue(toolbox.get_tool("swt-detection").uses_gpu)
+        self.assertFalse(toolbox.get_tool("simple-timepoints-stitcher").uses_gpu)
+        with patch.object(clams_tools, 'GPU_TOOLS', frozenset({"simple-timepoints-stitcher"})):
+            self.assertTrue(toolbox.get_tool("simple-timepoints-stitcher").uses_gpu)
+
+    def test_parse_app_servers(self):
+        """Test parsing of the CLAMS_APP_SERVERS mapping."""
+        servers = clams_tools._parse_app_servers("swt-detection=http://localhost:5001, bad-entry,")
+        self.assertEqual(servers, {"swt-detection": "http://localhost:5001"})
+
+    @patch.dict(clams_tools.APP_SERVERS, {"swt-detection": "http://localhost:5001"})
+    @patch.object(clams_tools._app_server_session, 'post')
+    def test_run_uses_app_server(self, mock_post):
+        """Test that a tool with a configured server is run over HTTP with query parameters."""
+        mock_post.return_value = MagicMock(ok=True, text='{"views": ["out"]}')
+        tool = self.toolbox.get_tool("swt-detection")
+
+        with patch.object(CLAMSTool, '_find_app_directory') as find_dir:
+            output = tool._run('{"views": []}', parameters=json.dumps({"pretty": True}))
+
+        self.assertEqual(output, '{"views": ["out"]}')
+        self.assertEqual(mock_post.call_args.kwargs["params"], {"pretty": True})
+        find_dir.assert_not_called()
+
+    @patch.dict(clams_tools.APP_SERVERS, {"swt-detection": "http://localhost:5001"})
+    @patch.object(clams_tools._app_server_session, 'post')
+    def test_run_mmif_streams_output_to_file(self, mock_post):
+        """Test that output_path makes the server response stream into a file."""
+        mock_post.return_value = MagicMock(ok=True)
+        mock_post.return_value.iter_content.return_value = [b'{"views": ', b'["out"]}']
+        tool = self.toolbox.get_tool("swt-detection")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "out.mmif")
+            self.assertEqual(tool.run_mmif('{"views": []}', output_path=output_path), output_path)
+            with open(output_path) as f:
+                self.assertEqual(f.read(), '{"views": ["out"]}')
+        self.assertTrue(mock_post.call_args.kwargs["stream"])
+
+    def test_run_reports_errors_as_json(self):
+        """Test that _run turns a failed app run into an error payload for the agent."""
+        tool = self.toolbox.get_tool("swt-detection")
+
+        with patch.object(CLAMSTool, 'run_mmif', side_effect=CLAMSToolError("app crashed")) as run_mmif:
+            output = tool._run('{"views": []}', parameters=json.dumps({"pretty": True}))
+
+        self.assertEqual(json.loads(output), {"error": "app crashed"})
+        self.assertEqual(run_mmif.call_args.args[2], {"pretty": True})
+
+if __name__ == '__main__':
+    unittest.main()
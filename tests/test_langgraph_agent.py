@@ -0,0 +1,45 @@
+import unittest
+from types import SimpleNamespace
+
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+
+from utils.langgraph_agent import CLAMSAgent
+
+
+class TestTrimHistory(unittest.TestCase):
+    """Test cases for the history-trimming pre-model hook."""
+
+    def setUp(self):
+        """Set up an agent with only the state the hook reads."""
+        self.agent = CLAMSAgent.__new__(CLAMSAgent)
+        self.agent.llm_config = SimpleNamespace(history_token_limit=200)
+        self.system = SystemMessage(content="You are a CLAMS pipeline expert.")
+
+    def test_old_turns_are_dropped_within_budget(self):
+        """Test that older turns are trimmed while the system prompt is kept."""
+        history = [self.system]
+        for i in range(20):
+            history += [HumanMessage(content=f"question {i}"), AIMessage(content=f"answer {i}")]
+        history.append(HumanMessage(content="latest question"))
+
+        messages = self.agent._trim_history({"messages": history})["llm_input_messages"]
+
+        self.assertIs(messages[0], self.system)
+        self.assertIs(messages[-1], history[-1])
+        self.assertLess(len(messages), len(history))
+
+    def test_over_budget_turn_is_kept(self):
+        """Test that a newest turn larger than the budget is still sent in full."""
+        question = HumanMessage(content="Run whisper on this video")
+        call = AIMessage(content="", tool_calls=[{"name": "whisper-wrapper", "args": {}, "id": "call-1"}])
+        result = ToolMessage(content="x" * 5000, tool_call_id="call-1")
+        history = [self.system, HumanMessage(content="hello"), AIMessage(content="hi"),
+                   question, call, result]
+
+        messages = self.agent._trim_history({"messages": history})["llm_input_messages"]
+
+        self.assertEqual(messages, [self.system, question, call, result])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import os
+import tempfile
+import time
+from utils.clams_tools import CLAMSToolbox, CLAMSToolError
+from utils.pipeline_execution import CLAMSExecutionEngine, PipelinePlan, ToolStep
+
+class TestPipelineExecution(unittest.TestCase):
+    """Test cases for the pipeline execution engine."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        def run_tool(input_mmif, config=None, parameters=None, output_path=None):
+            # Stand-in for a blocking CLAMS app subprocess
+            time.sleep(0.2)
+            if os.path.isfile(input_mmif):
+                with open(input_mmif) as f:
+                    input_mmif = f.read()
+            with open(output_path, 'w') as f:
+                f.write(input_mmif + "+annotated")
+            return output_path
+
+        self.gpu_running = 0
+        self.gpu_peak = 0
+
+        def run_gpu_tool(**kwargs):
+            self.gpu_running += 1
+            self.gpu_peak = max(self.gpu_peak, self.gpu_running)
+            try:
+                return run_tool(**kwargs)
+            finally:
+                self.gpu_running -= 1
+
+        self.tools = {
+            "slow-tool": MagicMock(run_mmif=MagicMock(side_effect=run_tool), uses_gpu=False),
+            "gpu-tool": MagicMock(run_mmif=MagicMock(side_effect=run_gpu_tool), uses_gpu=True),
+            "failing-tool": MagicMock(run_mmif=MagicMock(side_effect=CLAMSToolError("app crashed")), uses_gpu=False)
+        }
+        toolbox = MagicMock()
+        toolbox.get_tools.return_value = self.tools
+
+        with patch('utils.pipeline_execution.get_toolbox', return_value=toolbox):
+            self.engine = CLAMSExecutionEngine(max_workers=2, max_gpu_tools=1, output_retention=2)
+
+    def _plan(self, *tool_names):
+        return PipelinePlan(
+            steps=[ToolStep(tool_name=name) for name in tool_names],
+            reasoning="test",
+            estimated_total_time=30,
+            confidence=1.0,
+            input_types=[],
+            output_types=[]
+        )
+
+    def _collect(self, plan, input_mmif="mmif", output_dir=None):
+        async def run():
+            return [progress async for progress in self.engine.execute_plan(plan, input_mmif, output_dir)]
+        return asyncio.run(run())
+
+    def test_execute_plan_success(self):
+        """Test that each step's output feeds the next and the pipeline completes."""
+        updates = self._collect(self._plan("slow-tool", "slow-tool"))
+
+        self.assertEqual(updates[-1].step_name, "pipeline")
+        self.assertEqual(updates[-1].status, "completed")
+        first_output, final_output = (call.kwargs["output_path"]
+                                      for call in self.tools["slow-tool"].run_mmif.call_args_list)
+
+        # The work dir is removed; the final output is moved out of it first
+        self.assertFalse(os.path.exists(os.path.dirname(first_output)))
+        self.assertFalse(os.path.exists(final_output))
+        with open(updates[-1].output_path) as f:
+            self.assertEqual(f.read(), "mmif+annotated+annotated")
+
+    def test_final_output_written_to_output_dir(self):
+        """Test that a caller-supplied output_dir receives the final output."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            plan = self._plan("slow-tool")
+            updates = self._collect(plan, output_dir=output_dir)
+
+            self.assertEqual(updates[-1].output_path, os.path.join(output_dir, f"{plan.plan_id}.mmif"))
+            with open(updates[-1].output_path) as f:
+                self.assertEqual(f.read(), "mmif+annotated")
+
+    def test_engine_keeps_only_recent_outputs(self):
+        """Test that outputs without an output_dir are deleted past the retention limit."""
+        self.tools["slow-tool"].cacheable = False
+        outputs = [self._collect(self._plan("slow-tool"))[-1].output_path for _ in range(3)]
+
+        self.assertFalse(os.path.exists(outputs[0]))
+        self.assertTrue(all(os.path.exists(path) for path in outputs[1:]))
+
+    def test_failed_pipeline_leaves_no_files(self):
+        """Test that a failed pipeline's intermediate outputs are cleaned up."""
+        self._collect(self._plan("slow-tool", "failing-tool"))
+
+        output_path = self.tools["slow-tool"].run_mmif.call_args.kwargs["output_path"]
+        self.assertFalse(os.path.exists(os.path.dirname(output_path)))
+
+    def test_one_running_event_per_step(self):
+        """Test that a step reports running then completed, with no separate start event."""
+        updates = self._collect(self._plan("slow-tool"))
+
+        self.assertEqual([(u.step_name, u.status) for u in updates], [
+            ("slow-tool", "running"),
+            ("slow-tool", "completed"),
+            ("pipeline", "completed")
+        ])
+
+    def test_identical_step_reuses_cached_output(self):
+        """Test that rerunning a step on the same input reuses its output."""
+        self._collect(self._plan("slow-tool"))
+        second = self._collect(self._plan("slow-tool"))
+
+        self.assertEqual(self.tools["slow-tool"].run_mmif.call_count, 1)
+        with open(second[-1].output_path) as f:
+            self.assertEqual(f.read(), "mmif+annotated")
+
+    def test_non_cacheable_tool_always_runs(self):
+        """Test that tools marked non-cacheable are rerun on identical input."""
+        self.tools["slow-tool"].cacheable = False
+        self._collect(self._plan("slow-tool"))
+        self._collect(self._plan("slow-tool"))
+
+        self.assertEqual(self.tools["slow-tool"].run_mmif.call_count, 2)
+
+    def test_execute_plan_stops_on_tool_error(self):
+        """Test that a tool error fails the step and the pipeline."""
+        updates = self._collect(self._plan("failing-tool", "slow-tool"))
+
+        self.assertEqual(updates[-1].status, "failed")
+        self.assertIn("failing-tool", updates[-1].message)
+        self.tools["slow-tool"].run_mmif.assert_not_called()
+
+    def test_tool_runs_off_event_loop(self):
+        """Test that a blocking tool doesn't stall other coroutines on the loop."""
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker_task = asyncio.create_task(ticker())
+            async for _ in self.engine.execute_plan(self._plan("slow-tool"), "mmif"):
+                pass
+            ticker_task.cancel()
+            return ticks
+
+        self.assertGreater(asyncio.run(run()), 5)
+
+    def test_gpu_tools_run_one_at_a_time(self):
+        """Test that concurrent pipelines don't run GPU-bound tools at the same time."""
+        async def run():
+            async def drain(input_mmif):
+                async for _ in self.engine.execute_plan(self._plan("gpu-tool"), input_mmif):
+                    pass
+            await asyncio.gather(drain("mmif-a"), drain("mmif-b"))
+
+        asyncio.run(run())
+        self.assertEqual(self.tools["gpu-tool"].run_mmif.call_count, 2)
+        self.assertEqual(self.gpu_peak, 1)
+
+    def test_gpu_queue_does_not_block_cpu_tools(self):
+        """Test that steps waiting for the GPU don't hold the threads CPU-only tools run on."""
+        async def run():
+            async def drain(tool_name, input_mmif):
+                start = time.monotonic()
+                async for _ in self.engine.execute_plan(self._plan(tool_name), input_mmif):
+                    pass
+                return time.monotonic() - start
+            return await asyncio.gather(drain("gpu-tool", "mmif-a"), drain("gpu-tool", "mmif-b"),
+                                        drain("slow-tool", "mmif-c"))
+
+        *_, cpu_elapsed = asyncio.run(run())
+        # Both pool threads would otherwise be taken by the two GPU steps
+        self.assertLess(cpu_elapsed, 0.35)
+        self.assertEqual(self.gpu_peak, 1)
+
+    def test_heartbeat_while_tool_runs(self):
+        """Test that "running" updates keep arriving during a long tool call."""
+        self.engine.heartbeat_interval = 0.05
+        updates = self._collect(self._plan("slow-tool"))
+
+        running = [u for u in updates if u.status == "running"]
+        self.assertGreater(len(running), 2)
+        self.assertEqual(updates[-1].status, "completed")
+
+    def test_validate_plan_skips_prompt_formatting(self):
+        """Test that validating a plan doesn't build the LLM tool listing."""
+        toolbox = CLAMSToolbox({"swt-detection": {"metadata": {"description": "Detects scenes with text."}}})
+        with patch('utils.pipeline_execution.get_toolbox', return_value=toolbox):
+            engine = CLAMSExecutionEngine(max_workers=1)
+
+        issues = engine.validate_plan(self._plan("swt-detection", "ocr"))
+
+        self.assertEqual(issues, ["Step 2: Tool 'ocr' not available"])
+        self.assertNotIn("tool_descriptions", vars(toolbox))
+        self.assertNotIn("tool_metadata", vars(toolbox))
+
+if __name__ == '__main__':
+    unittest.main()
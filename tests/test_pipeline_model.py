@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+import os
+import tempfile
+import yaml
+from utils.pipeline_model import PipelineModel, PipelineStore
+
+class TestPipelineModel(unittest.TestCase):
+    """Test cases for pipeline models and their storage."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.pipeline = PipelineModel(name="Scene Text")
+        swt = self.pipeline.add_node("swt-detection", {"label": "SWT"})
+        ocr = self.pipeline.add_node("doctr-wrapper", {"label": "docTR"})
+        self.pipeline.add_edge(swt, ocr)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.store = PipelineStore(self.tmp_dir.name)
+
+    def test_add_edge_ignores_duplicates(self):
+        """Test that re-adding an edge returns the existing one, including after a load."""
+        self.assertEqual(self.pipeline.add_edge("swt-detection-0", "doctr-wrapper-1"), "swt-detection-0-doctr-wrapper-1")
+        self.assertEqual(len(self.pipeline.edges), 1)
+
+        loaded = PipelineModel.from_dict(self.pipeline.to_dict())
+        loaded.add_edge("swt-detection-0", "doctr-wrapper-1")
+        self.assertEqual(len(loaded.edges), 1)
+
+    def test_replacing_edges_resets_duplicate_check(self):
+        """Test that assigning a new edge list of the same length is indexed afresh."""
+        self.pipeline.edges = [{"id": "a-b", "source": "a", "target": "b"}]
+
+        self.assertEqual(self.pipeline.add_edge("swt-detection-0", "doctr-wrapper-1"), "swt-detection-0-doctr-wrapper-1")
+        self.assertEqual(self.pipeline.add_edge("a", "b"), "a-b")
+        self.assertEqual(len(self.pipeline.edges), 2)
+
+    def test_from_dict_accepts_incomplete_edges(self):
+        """Test that edges missing an id, source or target still load."""
+        data = self.pipeline.to_dict()
+        data["edges"] = [{"source": "swt-detection-0", "target": "doctr-wrapper-1"}, {"id": "dangling"}]
+        loaded = PipelineModel.from_dict(data)
+
+        self.assertEqual(len(loaded.edges), 2)
+        self.assertEqual(loaded.add_edge("swt-detection-0", "doctr-wrapper-1"), "swt-detection-0-doctr-wrapper-1")
+        self.assertEqual(len(loaded.edges), 2)
+
+    def test_yaml_round_trip(self):
+        """Test that a pipeline survives conversion to YAML and back."""
+        loaded = PipelineModel.from_yaml(self.pipeline.to_yaml())
+
+        self.assertEqual(loaded.to_dict(), self.pipeline.to_dict())
+
+    def test_yaml_leads_with_name(self):
+        """Test that the name is written before the node and edge lists."""
+        self.assertTrue(self.pipeline.to_yaml().startswith("name: Scene Text\n"))
+
+    def test_peek_header(self):
+        """Test reading the name without the body, with a full parse for other layouts."""
+        filepath = self.store.save_pipeline(self.pipeline)
+        self.assertEqual(PipelineModel.peek_header(filepath), {"name": "Scene Text"})
+
+        # Files written with sorted keys put the edges first
+        with open(filepath, 'w') as f:
+            f.write(yaml.dump(self.pipeline.to_dict()))
+        self.assertEqual(PipelineModel.peek_header(filepath), {"name": "Scene Text"})
+
+    def test_list_pipelines(self):
+        """Test that stored pipelines are listed by title-cased filename, skipping other entries."""
+        self.store.save_pipeline(self.pipeline)
+        os.mkdir(os.path.join(self.tmp_dir.name, "drafts.yaml"))
+        open(os.path.join(self.tmp_dir.name, "notes.txt"), 'w').close()
+
+        self.assertEqual(self.store.list_pipelines(), ["Scene Text"])
+
+    def test_list_pipeline_summaries(self):
+        """Test listing stored pipeline names alongside their files."""
+        self.store.save_pipeline(self.pipeline)
+
+        self.assertEqual(self.store.list_pipeline_summaries(),
+                         [{"name": "Scene Text", "file": "scene_text.yaml"}])
+
+        # Enough files to read the headers in parallel
+        for i in range(10):
+            self.store.save_pipeline(PipelineModel(name=f"Pipeline {i}"))
+        summaries = self.store.list_pipeline_summaries()
+        self.assertEqual(len(summaries), 11)
+        self.assertIn({"name": "Pipeline 7", "file": "pipeline_7.yaml"}, summaries)
+
+    def test_load_pipeline_reuses_parse_until_file_changes(self):
+        """Test that repeated loads skip parsing, and edits on disk are picked up."""
+        filepath = self.store.save_pipeline(self.pipeline)
+
+        with patch.object(PipelineModel, 'load_yaml', wraps=PipelineModel.load_yaml) as load_yaml:
+            first = self.store.load_pipeline("Scene Text")
+            first.clear()
+            second = self.store.load_pipeline("Scene Text")
+            self.assertEqual(load_yaml.call_count, 1)
+            self.assertEqual(len(second.nodes), 2)
+
+            self.pipeline.add_node("parseqocr-wrapper", {"label": "PARSeq"})
+            self.pipeline.save_yaml(filepath)
+            os.utime(filepath, ns=(0, 0))
+            self.assertEqual(len(self.store.load_pipeline(filepath).nodes), 3)
+            self.assertEqual(load_yaml.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
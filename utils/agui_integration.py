@@ -132,6 +132,9 @@ class AGUIEventHandler:
                     "task_description": "",
                     "conversation_history": [],
                     "pipeline": PipelineModel(name=f"Pipeline-{session_id}"),
+                    "selected_tools": [],
+                    "selected_tool_set": set(),
+                    "last_node_id": None,
                     "created_at": datetime.utcnow().isoformat(),
                     "welcome_sent": False
                 }
@@ -334,6 +337,7 @@ class AGUIEventHandler:
     def _streaming_update_to_agui_event(self, update: StreamingUpdate, session_id: str) -> AGUIEvent:
         """Convert StreamingUpdate to AG-UI event."""
         event_type_map = {
+            "assistant_token": AGUIEventType.TEXT_MESSAGE_CHUNK,
             "assistant_message": AGUIEventType.TEXT_MESSAGE_CONTENT,
             "tool_selected": AGUIEventType.TOOL_CALL_START,
             "tool_result": AGUIEventType.TOOL_CALL_RESULT,
@@ -361,12 +365,19 @@ class AGUIEventHandler:
         
         elif update.type == "tool_selected":
             tool_name = update.content.get("tool_name", "")
-            if tool_name and session.get("pipeline"):
-                # Add tool to pipeline (simplified)
-                session["pipeline"].add_node(
+            selected = session["selected_tool_set"]
+            if tool_name and tool_name not in selected and session.get("pipeline"):
+                selected.add(tool_name)
+                session["selected_tools"].append(tool_name)
+                
+                # Add tool to pipeline, chained after the previously selected one
+                node_id = session["pipeline"].add_node(
                     tool_id=tool_name,
                     tool_data={"name": tool_name, "selected_at": update.timestamp}
                 )
+                if session["last_node_id"]:
+                    session["pipeline"].add_edge(session["last_node_id"], node_id)
+                session["last_node_id"] = node_id
     
     def get_session_state(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get current session state."""
@@ -1,24 +1,148 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+import asyncio
 import json
+import re
+import sys
+import functools
 import subprocess
 import tempfile
 import os
 import logging
 from pathlib import Path
+import requests
+from types import MappingProxyType
+from dataclasses import dataclass
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks.manager import CallbackManagerForToolRun
-from .download_app_directory import get_app_metadata
+from .download_app_directory import load_app_metadata
 
 logger = logging.getLogger(__name__)
 
+# Trailing version segment of an MMIF vocabulary URI (e.g. ".../TimeFrame/v5")
+_VERSION_RE = re.compile(r'/v\d+$')
+
+# Lowercased output type -> input types it can also feed, beyond an exact match
+COMPATIBLE_INPUT_TYPES = {
+    'videodocument': ('timeframe', 'boundingbox'),
+    'timeframe': ('alignment', 'textdocument'),
+    'alignment': ('textdocument',),
+    'textdocument': ('namedentity', 'entity')
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_type_name(type_uri: str) -> str:
+    """Extract the bare type name from an MMIF or LAPPS vocabulary URI."""
+    # The vocabulary is small and the same URIs recur across most apps
+    return _VERSION_RE.sub('', type_uri).rpartition('/')[2]
+
+
+def extract_types(type_list: List[Dict[str, Any]]) -> List[str]:
+    """Extract clean type names from a list of MMIF input/output specs."""
+    names = (parse_type_name(type_info['@type']) for type_info in type_list
+             if isinstance(type_info, dict) and '@type' in type_info)
+    return [name for name in names if name]
+
+
+
+def _format_output_type(output_type: Dict[str, Any]) -> str:
+    """Format an output spec as its type URI plus notable properties."""
+    properties = output_type.get('properties', {})
+    props = [f"{key}={properties[key]}" for key in ('timeUnit', 'labelset') if key in properties]
+    type_str = output_type.get('@type', 'unknown')
+    return f"{type_str} ({', '.join(props)})" if props else type_str
+
+
+def _format_parameter(param: Dict[str, Any]) -> str:
+    """Format a parameter spec as 'name (type) = default: description'."""
+    parts = [param.get('name', 'unknown')]
+    if param.get('type'):
+        parts.append(f" ({param['type']})")
+    if param.get('default') is not None:
+        parts.append(f" = {param['default']}")
+    if param.get('description'):
+        parts.append(f": {param['description']}")
+    return ''.join(parts)
+
+@dataclass(frozen=True, slots=True)
+class ToolMeta:
+    """Read-only planning metadata for a CLAMS tool."""
+    name: str
+    description: str
+    input_types: Tuple[str, ...]
+    output_types: Tuple[str, ...]
+    parameters: Tuple[Dict[str, Any], ...]
+    app_version: str
+    # Lowercased type names for case-insensitive compatibility checks
+    input_types_lc: Tuple[str, ...]
+    output_types_lc: Tuple[str, ...]
+
+    @classmethod
+    def from_app_metadata(cls, name: str, metadata: Dict[str, Any]) -> 'ToolMeta':
+        """Build from the "metadata" section of an app directory entry."""
+        # Type names recur across many tools; interning makes them shared objects
+        input_types = tuple(map(sys.intern, extract_types(metadata.get('input', []))))
+        output_types = tuple(map(sys.intern, extract_types(metadata.get('output', []))))
+        return cls(
+            name=sys.intern(name),
+            description=metadata.get('description', ''),
+            input_types=input_types,
+            output_types=output_types,
+            parameters=tuple(metadata.get('parameters', [])),
+            app_version=metadata.get('app_version', 'unknown'),
+            input_types_lc=tuple(sys.intern(t.lower()) for t in input_types),
+            output_types_lc=tuple(sys.intern(t.lower()) for t in output_types),
+        )
+
+# Tool name -> resolved CLAMS app directory
+_app_directories: Dict[str, str] = {}
+
+
+def _parse_app_servers(spec: str) -> Dict[str, str]:
+    """Parse "tool=url,tool=url" into a tool name -> app server URL mapping."""
+    servers = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, sep, url = entry.partition('=')
+        if sep and name.strip() and url.strip():
+            servers[name.strip()] = url.strip()
+        else:
+            logger.warning("Ignoring malformed CLAMS_APP_SERVERS entry: %s", entry)
+    return servers
+
+
+# Already-running CLAMS app servers (e.g. `python app.py --port 5001`) to call
+# over HTTP instead of spawning the app per step, which reloads its models
+APP_SERVERS = _parse_app_servers(os.getenv('CLAMS_APP_SERVERS', ''))
+
+# Tools to treat as GPU-bound in addition to apps whose metadata declares GPU memory
+GPU_TOOLS = frozenset(filter(None, (name.strip() for name in os.getenv('CLAMS_GPU_TOOLS', '').split(','))))
+
+# Shared session so repeated calls to an app server reuse the connection
+_app_server_session = requests.Session()
+
+
+class CLAMSToolError(Exception):
+    """Raised when a CLAMS app fails to run or reports an error."""
+
+
 class CLAMSTool(BaseTool):
     """LangChain tool for CLAMS applications."""
     
     app_metadata: Dict[str, Any]
+    # Whether identical runs may reuse an earlier output; CLAMS apps are deterministic
+    # for a given input and parameters, so this is on unless an app says otherwise
+    cacheable: bool = True
     
     def __init__(self, name: str, description: str, app_metadata: Dict[str, Any]):
         super().__init__(name=name, description=description, app_metadata=app_metadata)
     
+    @property
+    def uses_gpu(self) -> bool:
+        """Whether the app needs a GPU, per CLAMS_GPU_TOOLS or its estimated GPU memory."""
+        metadata = self.app_metadata.get('metadata', {})
+        return (self.name in GPU_TOOLS
+                or bool(metadata.get('est_gpu_mem_min') or metadata.get('est_gpu_mem_typ')))
+    
     def _run(
         self,
         input_mmif: str,
@@ -35,13 +159,51 @@ class CLAMSTool(BaseTool):
             run_manager: Callback manager for tool execution
             
         Returns:
-            MMIF output as string
+            MMIF output as string, or a JSON {"error": ...} payload on failure
+        """
+        try:
+            params = json.loads(parameters) if parameters else None
+        except json.JSONDecodeError:
+            logger.warning("Invalid parameters JSON: %s", parameters)
+            params = None
+        
+        try:
+            return self.run_mmif(input_mmif, config, params)
+        except CLAMSToolError as e:
+            return json.dumps({"error": str(e)})
+    
+    def run_mmif(self, input_mmif: str, config: str = None,
+                 parameters: Optional[Dict[str, Any]] = None,
+                 output_path: Optional[str] = None) -> str:
+        """Execute the CLAMS tool and return its output MMIF.
+        
+        Unlike _run, failures are raised rather than encoded in the output, so
+        callers don't need to parse the MMIF to tell success from failure.
+        
+        Args:
+            input_mmif: Path to input MMIF file or MMIF content as string
+            config: Configuration name (e.g., 'default.yaml')
+            parameters: Optional app parameters
+            output_path: If given, write the output MMIF to this file as it is
+                produced instead of holding it in memory
+            
+        Returns:
+            MMIF output as string, or output_path if one was given
+            
+        Raises:
+            CLAMSToolError: If the app could not be run or reported a failure
         """
+        server_url = APP_SERVERS.get(self.name)
+        if server_url:
+            return self._run_on_server(server_url, input_mmif, config, parameters, output_path)
+        
+        input_file = None
+        temp_cli_wrapper = None
         try:
             # Determine the app directory path based on the tool name
             app_dir = self._find_app_directory()
             if not app_dir:
-                return json.dumps({"error": f"Could not find app directory for {self.name}"})
+                raise CLAMSToolError(f"Could not find app directory for {self.name}")
             
             # Check if input is a file path or MMIF content
             if os.path.isfile(input_mmif):
@@ -61,7 +223,7 @@ class CLAMSTool(BaseTool):
             elif os.path.exists(app_script):
                 script_path = app_script
             else:
-                return json.dumps({"error": f"No executable script found in {app_dir}"})
+                raise CLAMSToolError(f"No executable script found in {app_dir}")
             
             venv_python = os.path.join(app_dir, '.venv', 'bin', 'python')
             
@@ -81,13 +243,8 @@ class CLAMSTool(BaseTool):
                         cmd.extend(['--config', f'config/{config}'])
                 
                 # Add additional parameters
-                if parameters:
-                    try:
-                        params_dict = json.loads(parameters)
-                        for key, value in params_dict.items():
-                            cmd.extend([f'--{key}', str(value)])
-                    except json.JSONDecodeError:
-                        logger.warning(f"Invalid parameters JSON: {parameters}")
+                for key, value in (parameters or {}).items():
+                    cmd.extend([f'--{key}', str(value)])
                 
                 # Add input file for cli.py
                 cmd.append(input_file)
@@ -98,51 +255,127 @@ class CLAMSTool(BaseTool):
                 if temp_cli_wrapper:
                     cmd = [venv_python, temp_cli_wrapper]
                 else:
-                    return json.dumps({"error": f"Failed to create CLI wrapper for {self.name}"})
+                    raise CLAMSToolError(f"Failed to create CLI wrapper for {self.name}")
             
-            logger.info(f"Executing CLAMS tool {self.name}: {' '.join(cmd)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Executing CLAMS tool %s: %s", self.name, ' '.join(cmd))
             
             # Execute the command
-            result = subprocess.run(
-                cmd,
-                cwd=app_dir,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
+            if output_path:
+                # The app writes its output MMIF straight to the file
+                with open(output_path, 'w') as output_file:
+                    result = subprocess.run(
+                        cmd,
+                        cwd=app_dir,
+                        stdout=output_file,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        timeout=300  # 5 minute timeout
+                    )
+            else:
+                result = subprocess.run(
+                    cmd,
+                    cwd=app_dir,
+                    capture_output=True,
+                    text=True,
+                    timeout=300  # 5 minute timeout
+                )
             
+            if result.returncode == 0:
+                return output_path or result.stdout
+            else:
+                error_msg = f"Tool execution failed with return code {result.returncode}\nSTDERR: {result.stderr}"
+                if result.stdout:
+                    error_msg += f"\nSTDOUT: {result.stdout}"
+                logger.error(error_msg)
+                raise CLAMSToolError(error_msg)
+                
+        except subprocess.TimeoutExpired:
+            error_msg = f"Tool {self.name} execution timed out"
+            logger.error(error_msg)
+            raise CLAMSToolError(error_msg)
+        except CLAMSToolError:
+            raise
+        except Exception as e:
+            error_msg = f"Tool {self.name} execution failed: {str(e)}"
+            logger.error(error_msg)
+            raise CLAMSToolError(error_msg) from e
+        finally:
             # Clean up temporary files
-            if not os.path.isfile(input_mmif):
+            if input_file and input_file != input_mmif:
                 try:
                     os.unlink(input_file)
-                except:
+                except OSError:
                     pass
             
-            # Clean up temporary CLI wrapper if we created one
-            if not script_path.endswith('cli.py') and os.path.exists(script_path):
+            # Clean up the temporary CLI wrapper (never the app's own scripts)
+            if temp_cli_wrapper:
                 try:
-                    os.unlink(script_path)
-                except:
+                    os.unlink(temp_cli_wrapper)
+                except OSError:
                     pass
-            
-            if result.returncode == 0:
-                return result.stdout
+    
+    def _run_on_server(self, server_url: str, input_mmif: str, config: str = None,
+                       parameters: Optional[Dict[str, Any]] = None,
+                       output_path: Optional[str] = None) -> str:
+        """Send the MMIF to a running CLAMS app server and return its output MMIF."""
+        if config:
+            logger.warning("Config %s is not applied when %s runs as a server", config, self.name)
+        
+        logger.info("Sending MMIF to CLAMS app server %s at %s", self.name, server_url)
+        try:
+            if os.path.isfile(input_mmif):
+                # Stream the file as the request body rather than reading it in
+                with open(input_mmif, 'rb') as f:
+                    response = self._post_to_server(server_url, f, parameters, output_path)
             else:
-                error_msg = f"Tool execution failed with return code {result.returncode}\nSTDERR: {result.stderr}\nSTDOUT: {result.stdout}"
+                response = self._post_to_server(server_url, input_mmif.encode('utf-8'),
+                                                 parameters, output_path)
+            
+            if not response.ok:
+                error_msg = f"App server returned HTTP {response.status_code}\n{response.text}"
                 logger.error(error_msg)
-                return json.dumps({"error": error_msg})
-                
-        except subprocess.TimeoutExpired:
-            error_msg = f"Tool {self.name} execution timed out"
-            logger.error(error_msg)
-            return json.dumps({"error": error_msg})
+                raise CLAMSToolError(error_msg)
+            
+            if not output_path:
+                return response.text
+            with open(output_path, 'wb') as output_file:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    output_file.write(chunk)
+            return output_path
+            
+        except CLAMSToolError:
+            raise
         except Exception as e:
-            error_msg = f"Tool {self.name} execution failed: {str(e)}"
+            error_msg = f"Tool {self.name} server request failed: {str(e)}"
             logger.error(error_msg)
-            return json.dumps({"error": error_msg})
+            raise CLAMSToolError(error_msg) from e
+    
+    @staticmethod
+    def _post_to_server(server_url: str, body, parameters: Optional[Dict[str, Any]],
+                        output_path: Optional[str]) -> requests.Response:
+        """POST an MMIF body to an app server, streaming the response if it goes to a file."""
+        return _app_server_session.post(
+            server_url,
+            data=body,
+            params=parameters or {},
+            headers={'Content-Type': 'application/json'},
+            stream=bool(output_path),
+            timeout=300  # 5 minute timeout
+        )
     
     def _find_app_directory(self) -> Optional[str]:
-        """Find the app directory for this tool."""
+        """Find the app directory for this tool, reusing an earlier lookup."""
+        app_dir = _app_directories.get(self.name)
+        if app_dir is None:
+            app_dir = self._search_app_directory()
+            # Only hits are cached, so apps installed later are still found
+            if app_dir:
+                _app_directories[self.name] = app_dir
+        return app_dir
+    
+    def _search_app_directory(self) -> Optional[str]:
+        """Search the CLAMS apps root for this tool's app directory."""
         # Common app directory patterns
         clams_apps_root = "/home/kmlynch/clams_apps"
         
@@ -159,10 +392,11 @@ class CLAMSTool(BaseTool):
             if os.path.isdir(app_path) and os.path.exists(os.path.join(app_path, 'app.py')):
                 return app_path
         
-        logger.warning(f"Could not find app directory for {self.name}")
+        logger.warning("Could not find app directory for %s", self.name)
         return None
     
-    def _create_temp_cli_wrapper(self, app_dir: str, input_file: str, config: str = None, parameters: str = None) -> Optional[str]:
+    def _create_temp_cli_wrapper(self, app_dir: str, input_file: str, config: str = None,
+                                 parameters: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """Create a temporary CLI wrapper for apps that only have app.py."""
         try:
             # Create temporary Python script
@@ -189,8 +423,8 @@ def main():
                 break
     
     if clamsapp is None:
-        print(json.dumps({{"error": "Could not instantiate CLAMS app"}}))
-        return
+        print("Could not instantiate CLAMS app", file=sys.stderr)
+        sys.exit(1)
     
     # Read input MMIF
     with open('{input_file}', 'r') as f:
@@ -206,7 +440,7 @@ def main():
     {f'''
     # Add additional parameters
     try:
-        param_dict = {parameters}
+        param_dict = {parameters!r}
         params.update(param_dict)
     except:
         pass
@@ -217,7 +451,8 @@ def main():
         output_mmif = clamsapp.annotate(input_mmif, **params)
         print(output_mmif)
     except Exception as e:
-        print(json.dumps({{"error": f"App execution failed: {{str(e)}}"}}))
+        print(f"App execution failed: {{str(e)}}", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -229,7 +464,7 @@ if __name__ == "__main__":
                 return tmp.name
                 
         except Exception as e:
-            logger.error(f"Failed to create CLI wrapper: {e}")
+            logger.error("Failed to create CLI wrapper: %s", e)
             return None
     
     async def _arun(
@@ -239,17 +474,32 @@ if __name__ == "__main__":
         parameters: str = None,
         run_manager: Optional[CallbackManagerForToolRun] = None,
     ) -> str:
-        """Async version of _run."""
-        return self._run(input_mmif, config, parameters, run_manager)
+        """Async version of _run; the app subprocess runs in a worker thread."""
+        return await asyncio.to_thread(self._run, input_mmif, config, parameters, run_manager)
 
 class CLAMSToolbox:
     """Collection of CLAMS tools for use with LangChain agents."""
     
-    def __init__(self):
-        """Initialize the CLAMS toolbox."""
-        self.app_metadata = get_app_metadata()
-        self.tools = self._create_tools()
+    def __init__(self, app_metadata: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the CLAMS toolbox.
         
+        Args:
+            app_metadata: Formatted app directory; loaded (and cached on disk) if not given
+        """
+        # Loading the directory and building tools waits until something needs them
+        self._app_metadata = app_metadata
+    
+    @functools.cached_property
+    def app_metadata(self) -> Dict[str, Any]:
+        """Formatted app directory."""
+        return self._app_metadata if self._app_metadata is not None else load_app_metadata()
+    
+    @functools.cached_property
+    def tools(self) -> Dict[str, BaseTool]:
+        """Tool name -> CLAMSTool."""
+        return self._create_tools()
+    
     def _create_tools(self) -> Dict[str, BaseTool]:
         """Create BaseTool instances for each CLAMS app."""
         tools = {}
@@ -261,10 +511,8 @@ class CLAMSToolbox:
             input_types = []
             for input_type in metadata.get('input', []):
                 if isinstance(input_type, dict):
-                    type_str = input_type.get('@type', 'unknown')
-                    if input_type.get('required', False):
-                        type_str += ' (required)'
-                    input_types.append(type_str)
+                    required = ' (required)' if input_type.get('required', False) else ''
+                    input_types.append(f"{input_type.get('@type', 'unknown')}{required}")
                 elif isinstance(input_type, list):
                     # Handle nested lists of input types (alternatives)
                     alt_types = []
@@ -275,37 +523,14 @@ class CLAMSToolbox:
                         input_types.append(f"one of [{', '.join(alt_types)}]")
             
             # Extract and format output types
-            output_types = []
-            for output_type in metadata.get('output', []):
-                if isinstance(output_type, dict):
-                    type_str = output_type.get('@type', 'unknown')
-                    if 'properties' in output_type:
-                        props = []
-                        if 'timeUnit' in output_type['properties']:
-                            props.append(f"timeUnit={output_type['properties']['timeUnit']}")
-                        if 'labelset' in output_type['properties']:
-                            props.append(f"labelset={output_type['properties']['labelset']}")
-                        if props:
-                            type_str += f" ({', '.join(props)})"
-                    output_types.append(type_str)
+            output_types = [_format_output_type(output_type)
+                            for output_type in metadata.get('output', [])
+                            if isinstance(output_type, dict)]
             
             # Extract and format parameters
-            parameters = []
-            for param in metadata.get('parameters', []):
-                if isinstance(param, dict):
-                    param_str = param.get('name', 'unknown')
-                    param_type = param.get('type', '')
-                    param_desc = param.get('description', '')
-                    param_default = param.get('default', None)
-                    
-                    if param_type:
-                        param_str += f" ({param_type})"
-                    if param_default is not None:
-                        param_str += f" = {param_default}"
-                    if param_desc:
-                        param_str += f": {param_desc}"
-                        
-                    parameters.append(param_str)
+            parameters = [_format_parameter(param)
+                          for param in metadata.get('parameters', [])
+                          if isinstance(param, dict)]
             
             # Create tool description
             description = f"""CLAMS tool for {metadata.get('description', 'video analysis')}.
@@ -327,10 +552,82 @@ Version: {app_info.get('latest_version', 'unknown')}"""
             
         return tools
     
+    @functools.cached_property
+    def tool_metadata(self) -> Mapping[str, ToolMeta]:
+        """Per-tool descriptions, clean I/O type names and parameters for pipeline construction."""
+        tool_metas = (ToolMeta.from_app_metadata(name, tool.app_metadata.get('metadata', {}))
+                      for name, tool in self.tools.items())
+        # Shared by every agent in the process, so expose it read-only
+        return MappingProxyType({meta.name: meta for meta in tool_metas})
+    
+    @functools.cached_property
+    def tool_descriptions(self) -> str:
+        """One-line-per-tool listing of descriptions and I/O types for LLM prompts."""
+        descriptions = []
+        
+        for tool_name, metadata in self.tool_metadata.items():
+            input_types = ", ".join(metadata.input_types) if metadata.input_types else "Any"
+            output_types = ", ".join(metadata.output_types) if metadata.output_types else "Various"
+            
+            descriptions.append(
+                f"- {tool_name}: {metadata.description}\n"
+                f"  Input: {input_types} | Output: {output_types}"
+            )
+        
+        return "\n".join(descriptions)
+    
+    @functools.cached_property
+    def consumers_by_type(self) -> Dict[str, frozenset]:
+        """Lowercased input type name -> names of the tools that accept it."""
+        consumers = {}
+        for meta in self.tool_metadata.values():
+            for input_type in meta.input_types_lc:
+                consumers.setdefault(input_type, set()).add(meta.name)
+        return {type_name: frozenset(names) for type_name, names in consumers.items()}
+    
+    @functools.cached_property
+    def compatible_tools(self) -> Dict[str, Tuple[str, ...]]:
+        """Tool name -> tools that can consume its outputs, in toolbox order."""
+        consumers_by_type = self.consumers_by_type
+        adjacency = {}
+        for meta in self.tool_metadata.values():
+            # Direct type matches plus known conversions
+            accepted_types = set(meta.output_types_lc)
+            for output_type in meta.output_types_lc:
+                accepted_types.update(COMPATIBLE_INPUT_TYPES.get(output_type, ()))
+            
+            candidates = set().union(*(consumers_by_type.get(t, ()) for t in accepted_types))
+            candidates.discard(meta.name)
+            adjacency[meta.name] = tuple(name for name in self.tool_metadata if name in candidates)
+        return adjacency
+    
+    @functools.cached_property
+    def _tool_names_lc(self) -> Dict[str, str]:
+        """Lowercased tool name -> tool name."""
+        return {name.lower(): name for name in self.tools}
+    
+    def resolve_tool_name(self, name: str) -> Optional[str]:
+        """Map a tool name as an LLM wrote it (any case, stray spaces) to the toolbox's name."""
+        if name in self.tools:
+            return name
+        return self._tool_names_lc.get(name.strip().lower())
+    
+    def prewarm(self, tool_name: str):
+        """Resolve a tool's app directory ahead of its first run (e.g. the next pipeline step)."""
+        tool = self.tools.get(tool_name)
+        if tool is not None:
+            tool._find_app_directory()
+    
     def get_tools(self) -> Dict[str, BaseTool]:
         """Get all available CLAMS tools."""
         return self.tools
     
     def get_tool(self, name: str) -> BaseTool:
         """Get a specific CLAMS tool by name."""
-        return self.tools.get(name) 
\ No newline at end of file
+        return self.tools.get(name)
+
+
+@functools.lru_cache(maxsize=1)
+def get_toolbox() -> CLAMSToolbox:
+    """Shared CLAMSToolbox, so the app directory is fetched once per process."""
+    return CLAMSToolbox()
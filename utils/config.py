@@ -11,7 +11,9 @@ class LLMConfig:
     temperature: float = 0.7
     top_p: float = 0.9
     max_length: int = 2048
-    provider: str = "ollama"  # "ollama" or "openai"
+    provider: str = "ollama"  # "ollama", "openai", or "vllm" (OpenAI-compatible server at base_url)
+    keep_alive: str = "30m"  # How long Ollama keeps the model (and its prompt cache) loaded
+    history_token_limit: int = 8192  # Approx. tokens of thread history sent per model call (0 = no limit)
     system_prompt: str = """You are an AI assistant helping to analyze video content using CLAMS tools. 
 Your goal is to understand user requests about video content and create appropriate pipelines of CLAMS tools to process the videos.
 You have access to various CLAMS tools that can analyze different aspects of videos, such as:
@@ -1,6 +1,7 @@
 import requests
 import json
 import os
+import time
 from typing import Dict, Any, Optional
 import logging
 from urllib.parse import urljoin
@@ -9,6 +10,15 @@ from urllib.parse import urljoin
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Runtime cache of the formatted app directory, refreshed by load_app_metadata (not tracked by git)
+APP_DIRECTORY_PATH = os.path.join(os.path.dirname(__file__), '../data/cache/app_directory.json')
+
+# Committed snapshot of the app directory, used when the cache is missing and the download fails
+APP_DIRECTORY_SNAPSHOT = os.path.join(os.path.dirname(__file__), '../data/app_directory.json')
+
+# Seconds before the local copy is considered stale and downloaded again
+APP_DIRECTORY_MAX_AGE = int(os.getenv('CLAMS_APP_DIRECTORY_MAX_AGE', 7 * 24 * 3600))
+
 def fetch_app_metadata(app_name: str, version: str) -> Dict[str, Any]:
     """
     Fetches the metadata.json for a specific app version
@@ -32,12 +42,14 @@ def fetch_app_metadata(app_name: str, version: str) -> Dict[str, Any]:
         logger.error(f"Failed to fetch metadata for {app_name} {version}: {e}")
         return {}
 
-def get_app_metadata(app_name: Optional[str] = None) -> Dict[str, Any]:
+def get_app_metadata(app_name: Optional[str] = None, strict: bool = False) -> Dict[str, Any]:
     """
     Download and parse the CLAMS app directory from GitHub.
     
     Args:
         app_name: Optional name of a specific app to get metadata for
+        strict: Raise if any app's metadata cannot be fetched, instead of
+            listing that app with empty inputs, outputs and parameters
         
     Returns:
         Dictionary mapping app names to their metadata
@@ -60,10 +72,12 @@ def get_app_metadata(app_name: Optional[str] = None) -> Dict[str, Any]:
             latest_version = app_info["versions"][0][0] if app_info["versions"] else "unknown"
             
             # Extract app name from URL
-            app_name_from_url = app_url.split('/')[-1]
+            app_name_from_url = app_url.rpartition('/')[2]
             
             # Fetch detailed metadata for the latest version
             detailed_metadata = fetch_app_metadata(app_name_from_url, latest_version)
+            if strict and not detailed_metadata:
+                raise RuntimeError(f"Could not fetch metadata for {app_name_from_url} {latest_version}")
             
             formatted_apps[app_name_from_url] = {
                 "latest_version": latest_version,
@@ -93,25 +107,86 @@ def get_app_metadata(app_name: Optional[str] = None) -> Dict[str, Any]:
         logger.error(f"Unexpected error: {e}")
         raise
 
+def _read_app_directory(path: str) -> Optional[Dict[str, Any]]:
+    """Read a formatted app directory JSON file, or None if it is missing, unreadable or empty."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f) or None
+    except (OSError, json.JSONDecodeError) as e:
+        logger.debug(f"No usable app directory at {path}: {e}")
+        return None
+
+def load_app_metadata(cache_path: str = APP_DIRECTORY_PATH,
+                      max_age: Optional[float] = None,
+                      snapshot_path: str = APP_DIRECTORY_SNAPSHOT) -> Dict[str, Any]:
+    """
+    Load the formatted app directory from the local cache, downloading it when stale.
+    
+    Only complete downloads are cached. If the download fails, the stale
+    cache is used, or failing that the committed snapshot.
+    
+    Args:
+        cache_path: Path of the runtime app directory cache
+        max_age: Maximum age in seconds of the cache (default APP_DIRECTORY_MAX_AGE)
+        snapshot_path: Read-only app directory to fall back on when offline
+        
+    Returns:
+        Dictionary mapping app names to their metadata
+    """
+    if max_age is None:
+        max_age = APP_DIRECTORY_MAX_AGE
+    
+    cached = _read_app_directory(cache_path)
+    if cached is not None and time.time() - os.path.getmtime(cache_path) < max_age:
+        logger.info(f"Loaded {len(cached)} apps from {cache_path}")
+        return cached
+    
+    try:
+        app_directory = get_app_metadata(strict=True)
+    except Exception as e:
+        fallback_path = cache_path if cached is not None else snapshot_path
+        app_directory = cached if cached is not None else _read_app_directory(snapshot_path)
+        if app_directory is None:
+            raise
+        logger.warning(f"Could not refresh the app directory ({e}); "
+                       f"using {len(app_directory)} apps from {fallback_path}")
+        return app_directory
+    
+    save_app_metadata(app_directory, cache_path)
+    return app_directory
+
+def save_app_metadata(app_directory: Dict[str, Any], output_path: str = APP_DIRECTORY_PATH):
+    """Write the formatted app directory to a local JSON file."""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Write to a temporary file first so readers never see a partial file
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(app_directory, f, indent=2)
+    os.replace(tmp_path, output_path)
+
 if __name__ == "__main__":
-    # When run directly, download the app directory and save it to a file
-    output_path = os.path.join(os.path.dirname(__file__), '../data/app_directory.json')
+    # When run directly, refresh the cached app directory
+    output_path = APP_DIRECTORY_PATH
     
     # Add command line argument parsing for forcing fresh download
     import argparse
     parser = argparse.ArgumentParser(description='Download CLAMS app directory')
     parser.add_argument('--force', action='store_true', help='Force fresh download instead of using cache')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='Also update the committed snapshot with a complete fresh download')
     args = parser.parse_args()
     
-    app_directory = get_app_metadata()
+    if args.snapshot:
+        app_directory = get_app_metadata(strict=True)
+        save_app_metadata(app_directory, output_path)
+        save_app_metadata(app_directory, APP_DIRECTORY_SNAPSHOT)
+    else:
+        app_directory = load_app_metadata(output_path, max_age=0 if args.force else None)
     print(f"\nRetrieved information for {len(app_directory)} CLAMS apps")
     
     # Print the full formatted app directory
     print("\nFull app directory data:")
     print(json.dumps(app_directory, indent=2))
-    
-    # Save to file
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w') as f:
-        json.dump(app_directory, f, indent=2)
     print(f"\nSaved app directory to {output_path}")
+    if args.snapshot:
+        print(f"Saved app directory snapshot to {APP_DIRECTORY_SNAPSHOT}")
@@ -6,11 +6,14 @@ Uses conversational planning + direct tool execution for reliability.
 from typing import List, Dict, Any, Optional, TypedDict, Annotated, AsyncGenerator
 import logging
 import json
+import os
 import asyncio
+import functools
+import uuid
 from dataclasses import dataclass, field
 
-from langchain_ollama import ChatOllama
 from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
 from langchain_core.tools import BaseTool
 from langgraph.graph.message import add_messages
 from langgraph.graph import START, StateGraph, END
@@ -19,8 +22,9 @@ from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import create_react_agent
 
 from .pipeline_model import PipelineModel, PipelineStore
-from .clams_tools import CLAMSToolbox
+from .clams_tools import get_toolbox
 from .config import ConfigManager
+from .llm_factory import create_chat_model
 from .planning_agent import CLAMSPlanningAgent
 from .pipeline_execution import CLAMSExecutionEngine, PipelinePlan, ExecutionProgress
 
@@ -55,49 +59,47 @@ class CLAMSAgent:
     Combines conversational planning with direct tool execution for reliability.
     """
     
-    def __init__(self, config_manager: ConfigManager = None):
+    def __init__(self, config_manager: ConfigManager = None, checkpoint_durability: str = "exit"):
         """
         Initialize the CLAMS agent.
         
         Args:
             config_manager: Configuration manager instance
+            checkpoint_durability: LangGraph durability mode for conversation
+                checkpoints. "exit" persists once at the end of each run instead
+                of after every node; use "async" or "sync" for per-step writes.
         """
         # Initialize configuration
         self.config_manager = config_manager or ConfigManager()
         self.llm_config = self.config_manager.get_config().llm
         
         # Initialize LLM for backward compatibility
-        if self.llm_config.provider == "ollama":
-            self.llm = ChatOllama(
-                model=self.llm_config.model_name,
-                base_url=self.llm_config.base_url,
-                temperature=self.llm_config.temperature,
-                top_p=self.llm_config.top_p
-            )
-        else:
-            from langchain_openai import ChatOpenAI
-            self.llm = ChatOpenAI(
-                model=self.llm_config.model_name, 
-                streaming=True,
-                temperature=self.llm_config.temperature
-            )
+        self.llm = create_chat_model(self.llm_config, streaming=True)
         
         # Initialize core components
         self.planner = CLAMSPlanningAgent(config_manager)
         self.executor = CLAMSExecutionEngine()
-        self.pipeline_store = PipelineStore()
         
         # Legacy support - initialize tools for backward compatibility
-        self.toolbox = CLAMSToolbox()
+        self.toolbox = get_toolbox()
         self.tools = self._initialize_clams_tools()
-        self.tool_metadata = self._initialize_tool_metadata()
+        self.tool_metadata = self.toolbox.tool_metadata
         
         # Memory for conversation persistence
         self.memory = MemorySaver()
+        self.checkpoint_durability = checkpoint_durability
+        
+        # Static system prompt, stored once at the head of each thread's history
+        self.system_message = self._create_system_message()
         
         # Create the agent using modern patterns (for legacy support)
         self.app = self._create_modern_agent()
     
+    @functools.cached_property
+    def pipeline_store(self) -> PipelineStore:
+        """Pipeline storage, created on first use since most agents never save."""
+        return PipelineStore()
+    
     def _initialize_clams_tools(self) -> List[BaseTool]:
         """Initialize CLAMS tools as proper LangChain tools."""
         tools = []
@@ -127,60 +129,48 @@ class CLAMSAgent:
         clams_tool_wrapper.tool_metadata = metadata
         return clams_tool_wrapper
     
-    def _initialize_tool_metadata(self) -> Dict[str, Any]:
-        """Initialize tool metadata for pipeline construction."""
-        metadata = {}
-        
-        for tool_name, clams_tool in self.toolbox.get_tools().items():
-            app_info = clams_tool.app_metadata
-            tool_metadata = app_info.get('metadata', {})
-            
-            # Extract and clean input/output types
-            input_types = self._extract_types(tool_metadata.get('input', []))
-            output_types = self._extract_types(tool_metadata.get('output', []))
-            
-            metadata[tool_name] = {
-                'description': tool_metadata.get('description', ''),
-                'input_types': input_types,
-                'output_types': output_types,
-                'parameters': tool_metadata.get('parameters', []),
-                'app_version': tool_metadata.get('app_version', 'unknown')
-            }
-        
-        return metadata
-    
-    def _extract_types(self, type_list: List[Dict[str, Any]]) -> List[str]:
-        """Extract clean type names from MMIF type URIs."""
-        types = []
-        for type_info in type_list:
-            if isinstance(type_info, dict) and '@type' in type_info:
-                type_uri = type_info['@type']
-                # Extract clean type name
-                type_name = type_uri.split('/')[-1]
-                # Remove version numbers
-                clean_name = type_name.split('v')[0] if 'v' in type_name else type_name
-                if clean_name:
-                    types.append(clean_name)
-        return types
-    
     def _create_modern_agent(self):
         """Create the agent using modern LangGraph patterns."""
-        # Create system message for CLAMS pipeline assistance
-        system_message = self._create_system_message()
-        
         # Bind tools directly to the LLM first
         llm_with_tools = self.llm.bind_tools(self.tools)
         
-        # Use create_react_agent for modern pattern with checkpointer
+        # Use create_react_agent for modern pattern with checkpointer.
+        # No prompt is passed: the system message lives in the thread state
+        # (see stream_response), so the model is called with the stored
+        # message list as-is instead of a rebuilt [system] + history copy.
+        # The pre-model hook bounds what each call sends without dropping
+        # anything from the checkpointed history.
+        pre_model_hook = self._trim_history if self.llm_config.history_token_limit > 0 else None
         agent = create_react_agent(
             llm_with_tools,
             self.tools,
-            prompt=system_message,
-            checkpointer=self.memory
+            checkpointer=self.memory,
+            pre_model_hook=pre_model_hook
         )
         
         return agent
     
+    def _trim_history(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Pre-model hook: keep the system prompt plus the most recent turns within the token budget."""
+        history = state["messages"]
+        messages = trim_messages(
+            history,
+            strategy="last",
+            token_counter=count_tokens_approximately,
+            max_tokens=self.llm_config.history_token_limit,
+            include_system=True,
+            start_on="human",
+            end_on=("human", "tool")
+        )
+        if all(isinstance(msg, SystemMessage) for msg in messages):
+            # The newest turn alone is over budget; send it whole rather than
+            # calling the model with the system prompt and nothing to answer
+            last_human = max((i for i, msg in enumerate(history) if isinstance(msg, HumanMessage)),
+                             default=0)
+            system = [msg for msg in history[:last_human] if isinstance(msg, SystemMessage)]
+            messages = system + list(history[last_human:])
+        return {"llm_input_messages": messages}
+    
     def _create_system_message(self) -> SystemMessage:
         """Create a comprehensive system message for the agent."""
         tool_descriptions = self._get_tool_descriptions()
@@ -219,23 +209,13 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
     
     def _get_tool_descriptions(self) -> str:
         """Get formatted descriptions of all available tools."""
-        descriptions = []
-        
-        for tool_name, metadata in self.tool_metadata.items():
-            input_types = ", ".join(metadata['input_types']) if metadata['input_types'] else "Any"
-            output_types = ", ".join(metadata['output_types']) if metadata['output_types'] else "Various"
-            
-            descriptions.append(
-                f"- {tool_name}: {metadata['description']}\n"
-                f"  Input: {input_types} | Output: {output_types}"
-            )
-        
-        return "\n".join(descriptions)
+        return self.toolbox.tool_descriptions
     
     async def stream_response(self, 
                              user_input: str, 
                              task_description: str = "",
-                             thread_id: str = "default") -> AsyncGenerator[StreamingUpdate, None]:
+                             thread_id: str = "default",
+                             stream_tokens: bool = False) -> AsyncGenerator[StreamingUpdate, None]:
         """
         Generate streaming responses for real-time UI updates.
         
@@ -243,14 +223,28 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
             user_input: User's message
             task_description: Overall task description
             thread_id: Conversation thread identifier
+            stream_tokens: Also yield "assistant_token" updates as the LLM
+                generates them, ahead of the complete node updates
             
         Yields:
             StreamingUpdate objects for real-time UI updates
         """
         try:
+            # Configuration for persistent conversation
+            config = {"configurable": {"thread_id": thread_id}}
+            
+            # Seed threads with no checkpointed history with the system prompt
+            # so it stays a stable prefix; the checkpoint is the source of truth,
+            # so failed, abandoned or concurrent first turns can't duplicate it
+            input_messages = []
+            state = await self.app.aget_state(config)
+            if not state.values.get("messages"):
+                input_messages.append(self.system_message)
+            input_messages.append(HumanMessage(content=user_input))
+            
             # Create initial state
             initial_state = {
-                "messages": [HumanMessage(content=user_input)],
+                "messages": input_messages,
                 "task_description": task_description,
                 "pipeline_dict": {"name": "Streaming Pipeline", "nodes": [], "edges": []},
                 "selected_tools": [],
@@ -260,11 +254,27 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
                 "current_step": "processing"
             }
             
-            # Configuration for persistent conversation
-            config = {"configurable": {"thread_id": thread_id}}
-            
-            # Stream the agent execution
-            async for chunk in self.app.astream(initial_state, config=config):
+            # Stream the agent execution; token chunks arrive interleaved with node updates
+            stream_mode = ["messages", "updates"] if stream_tokens else "updates"
+            async for item in self.app.astream(initial_state, config=config,
+                                               stream_mode=stream_mode,
+                                               durability=self.checkpoint_durability):
+                if stream_tokens:
+                    mode, chunk = item
+                    if mode == "messages":
+                        token, metadata = chunk
+                        if isinstance(token, AIMessage) and token.content:
+                            yield StreamingUpdate(
+                                type="assistant_token",
+                                content={
+                                    "content": token.content,
+                                    "node": metadata.get("langgraph_node", "")
+                                }
+                            )
+                        continue
+                else:
+                    chunk = item
+                
                 for node_name, node_state in chunk.items():
                     if "messages" in node_state:
                         messages = node_state["messages"]
@@ -374,6 +384,35 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
                 "thread_id": thread_id
             }
     
+    async def batch_get_response(self,
+                                 requests: List[Dict[str, str]],
+                                 concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get complete responses for many requests concurrently.
+        
+        Args:
+            requests: Dicts with "user_input" and optional "task_description"
+                and "thread_id" (defaults to a fresh "batch-<uuid>" thread)
+            concurrency: Max requests in flight; defaults to the
+                CLAMS_BATCH_CONCURRENCY environment variable, else 4
+            
+        Returns:
+            Response dictionaries in the same order as requests
+        """
+        if concurrency is None:
+            concurrency = int(os.getenv('CLAMS_BATCH_CONCURRENCY', 4))
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        
+        async def run(req: Dict[str, str]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.get_response(
+                    req["user_input"],
+                    req.get("task_description", ""),
+                    req.get("thread_id") or f"batch-{uuid.uuid4()}"
+                )
+        
+        return await asyncio.gather(*(run(req) for req in requests))
+    
     # New hybrid approach methods
     async def plan_pipeline(self, user_query: str) -> PipelinePlan:
         """
@@ -401,24 +440,28 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
     
     async def execute_pipeline(self, 
                               plan: PipelinePlan, 
-                              input_mmif: str) -> AsyncGenerator[ExecutionProgress, None]:
+                              input_mmif: str,
+                              output_dir: Optional[str] = None) -> AsyncGenerator[ExecutionProgress, None]:
         """
         Execute a pipeline plan with progress streaming.
         
         Args:
             plan: The pipeline plan to execute
             input_mmif: Input MMIF data or file path
+            output_dir: Directory to write the final output MMIF to (see
+                CLAMSExecutionEngine.execute_plan)
             
         Yields:
             ExecutionProgress: Real-time progress updates
         """
-        async for progress in self.executor.execute_plan(plan, input_mmif):
+        async for progress in self.executor.execute_plan(plan, input_mmif, output_dir):
             yield progress
     
     async def process_request(self, 
                              user_query: str, 
                              input_mmif: Optional[str] = None,
-                             auto_execute: bool = False) -> Dict[str, Any]:
+                             auto_execute: bool = False,
+                             output_dir: Optional[str] = None) -> Dict[str, Any]:
         """
         Complete hybrid processing: planning + optional execution.
         
@@ -426,6 +469,7 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
             user_query: User's request description
             input_mmif: Optional MMIF input for execution
             auto_execute: If True, automatically execute the plan
+            output_dir: Directory for the executed pipeline's output MMIF
             
         Returns:
             Dictionary with plan, explanation, and execution results
@@ -433,7 +477,8 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
         try:
             # Phase 1: Planning
             plan = await self.plan_pipeline(user_query)
-            explanation = await self.explain_pipeline(user_query)
+            # Describe the plan we already have rather than planning a second time
+            explanation = self.planner.describe_plan(plan, user_query)
             
             result = {
                 "plan": plan,
@@ -453,13 +498,14 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
                 
                 # Execute with progress collection
                 execution_updates = []
-                async for progress in self.execute_pipeline(plan, input_mmif):
+                async for progress in self.execute_pipeline(plan, input_mmif, output_dir):
                     execution_updates.append(progress)
                 
                 result["execution_results"] = execution_updates
                 final_progress = execution_updates[-1] if execution_updates else None
                 if final_progress and final_progress.status == "completed":
                     result["status"] = "completed"
+                    result["output_path"] = final_progress.output_path
                 else:
                     result["status"] = "execution_failed"
             
@@ -489,41 +535,9 @@ Be conversational but precise. Ask clarifying questions if the user's requiremen
             # Return common starting tools
             return ['transnet-wrapper', 'whisper-wrapper', 'easyocr-wrapper']
         
-        compatible_tools = []
-        last_tool = self.tool_metadata[last_tool_name]
-        
-        for tool_name, metadata in self.tool_metadata.items():
-            if tool_name == last_tool_name:
-                continue
-            
-            # Check output -> input compatibility
-            for output_type in last_tool.get('output_types', []):
-                for input_type in metadata.get('input_types', []):
-                    if self._types_compatible(output_type, input_type):
-                        compatible_tools.append(tool_name)
-                        break
-        
-        return compatible_tools[:5]  # Return top 5 suggestions
-    
-    def _types_compatible(self, output_type: str, input_type: str) -> bool:
-        """Check if output type is compatible with input type."""
-        # Normalize for comparison
-        output_lower = output_type.lower()
-        input_lower = input_type.lower()
-        
-        # Direct match
-        if output_lower == input_lower:
-            return True
-        
-        # Common compatibility patterns
-        compatibility_map = {
-            'videodocument': ['timeframe', 'boundingbox'],
-            'timeframe': ['alignment', 'textdocument'],
-            'alignment': ['textdocument'],
-            'textdocument': ['namedentity', 'entity']
-        }
-        
-        return input_lower in compatibility_map.get(output_lower, [])
+        # Adjacency is precomputed once on the shared toolbox
+        compatible_tools = self.toolbox.compatible_tools[last_tool_name]
+        return list(compatible_tools[:5])  # Return top 5 suggestions
     
     async def create_pipeline_from_conversation(self, thread_id: str = "default") -> PipelineModel:
         """Extract pipeline from conversation history."""
@@ -0,0 +1,66 @@
+"""
+Chat model construction for the configured LLM provider.
+"""
+
+import functools
+import os
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_ollama import ChatOllama
+
+from .config import LLMConfig
+
+
+def create_chat_model(llm_config: LLMConfig, streaming: bool = False) -> BaseChatModel:
+    """
+    Create a chat model for the configured provider.
+
+    Args:
+        llm_config: LLM settings; provider is "ollama", "openai", or "vllm"
+            (any OpenAI-compatible server at base_url, e.g. vLLM or TGI)
+        streaming: Request streamed completions from OpenAI-style providers
+
+    Returns:
+        LangChain chat model, shared with other callers using the same settings
+    """
+    return _cached_chat_model(
+        llm_config.provider,
+        llm_config.model_name,
+        llm_config.base_url,
+        llm_config.temperature,
+        llm_config.top_p,
+        llm_config.keep_alive,
+        streaming
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_chat_model(provider: str, model_name: str, base_url: str, temperature: float,
+                       top_p: float, keep_alive: str, streaming: bool) -> BaseChatModel:
+    """Build a chat model; cached so agents with the same settings share one client."""
+    if provider == "ollama":
+        return ChatOllama(
+            model=model_name,
+            base_url=base_url,
+            temperature=temperature,
+            top_p=top_p,
+            keep_alive=keep_alive
+        )
+
+    from langchain_openai import ChatOpenAI
+    if provider == "vllm":
+        # Self-hosted servers batch concurrent requests; the key is usually unchecked
+        return ChatOpenAI(
+            model=model_name,
+            base_url=base_url,
+            api_key=os.getenv('OPENAI_API_KEY', 'EMPTY'),
+            streaming=streaming,
+            temperature=temperature,
+            top_p=top_p
+        )
+
+    return ChatOpenAI(
+        model=model_name,
+        streaming=streaming,
+        temperature=temperature
+    )
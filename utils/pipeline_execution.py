@@ -5,17 +5,34 @@ Handles direct tool execution with progress tracking.
 
 from typing import List, Dict, Any, Optional, AsyncGenerator
 import asyncio
+import functools
+import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from datetime import datetime
 import uuid
 
-from .clams_tools import CLAMSToolbox
+from .clams_tools import get_toolbox
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Number of GPU-bound tools allowed to run at once across all pipelines
+MAX_GPU_TOOLS = int(os.getenv('CLAMS_MAX_GPU_TOOLS', '1'))
+
+# Number of step outputs kept for reuse when a step is rerun on the same input; 0 disables
+STEP_CACHE_SIZE = int(os.getenv('CLAMS_STEP_CACHE_SIZE', '32'))
+
+# Number of final pipeline outputs the engine keeps when the caller gives no output_dir
+OUTPUT_RETENTION = int(os.getenv('CLAMS_OUTPUT_RETENTION', '16'))
+
+@dataclass(slots=True)
 class ToolStep:
     """Represents a single tool execution step in a pipeline."""
     tool_name: str
@@ -23,8 +40,16 @@ class ToolStep:
     config: Optional[str] = None
     reasoning: str = ""
     estimated_time: int = 30  # seconds
+    _parameters_json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def parameters_json(self) -> str:
+        """Canonical JSON of the parameters, computed once per step."""
+        if self._parameters_json is None:
+            self._parameters_json = json.dumps(self.parameters, sort_keys=True)
+        return self._parameters_json
     
-@dataclass 
+@dataclass(slots=True)
 class PipelinePlan:
     """Structured pipeline plan with tools and execution metadata."""
     steps: List[ToolStep]
@@ -36,18 +61,29 @@ class PipelinePlan:
     plan_id: str = field(default_factory=lambda: str(uuid.uuid4()))
     created_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
-@dataclass
+@dataclass(slots=True)
 class StepResult:
     """Result of executing a single pipeline step."""
     step: ToolStep
     success: bool
-    output: str = ""
+    output: str = ""  # Path of the file holding the step's output MMIF
     error: Optional[str] = None
     execution_time: float = 0.0
-    start_time: str = field(default_factory=lambda: datetime.now().isoformat())
-    end_time: Optional[str] = None
+    # Wall-clock epoch seconds; formatted only when someone asks for them
+    start_time: float = 0.0
+    end_time: Optional[float] = None
+    
+    @property
+    def start_time_iso(self) -> str:
+        """Step start time as an ISO 8601 string."""
+        return datetime.fromtimestamp(self.start_time).isoformat()
+    
+    @property
+    def end_time_iso(self) -> Optional[str]:
+        """Step end time as an ISO 8601 string, if the step has finished."""
+        return datetime.fromtimestamp(self.end_time).isoformat() if self.end_time is not None else None
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionResult:
     """Complete pipeline execution result."""
     plan: PipelinePlan
@@ -57,157 +93,262 @@ class ExecutionResult:
     final_output: str = ""
     error_summary: Optional[str] = None
     
-@dataclass
+@dataclass(slots=True)
 class ExecutionProgress:
     """Progress update during pipeline execution."""
     current_step: int
     total_steps: int
     step_name: str
-    status: str  # "starting", "running", "completed", "failed"
+    status: str  # "running", "completed", "failed"
     message: str = ""
     percentage: float = 0.0
+    output_path: Optional[str] = None  # Final output MMIF file, set on the pipeline's completion update
 
 class CLAMSExecutionEngine:
     """Direct execution engine for CLAMS tool pipelines."""
     
-    def __init__(self):
-        """Initialize the execution engine."""
-        self.toolbox = CLAMSToolbox()
+    def __init__(self, max_workers: Optional[int] = None, heartbeat_interval: float = 2.0,
+                 step_cache_size: int = STEP_CACHE_SIZE, max_gpu_tools: int = MAX_GPU_TOOLS,
+                 output_retention: int = OUTPUT_RETENTION):
+        """
+        Initialize the execution engine.
+        
+        Args:
+            max_workers: Size of the thread pool that runs tools (default: ThreadPoolExecutor's)
+            heartbeat_interval: Seconds between "running" updates while a tool works
+            step_cache_size: Number of step outputs to keep for identical reruns (0 disables)
+            max_gpu_tools: Number of GPU-bound tools that may run at once
+            output_retention: Number of final outputs kept in the engine's own
+                output directory for runs that don't pass an output_dir
+        """
+        self.heartbeat_interval = heartbeat_interval
+        self.step_cache_size = step_cache_size
+        # Step input key -> cached output MMIF file, least recently used first
+        self._step_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._step_cache_dir: Optional[tempfile.TemporaryDirectory] = None
+        self.output_retention = output_retention
+        # Final outputs of runs without an output_dir, oldest first
+        self._outputs: "deque[str]" = deque()
+        self._output_dir: Optional[tempfile.TemporaryDirectory] = None
+        self.toolbox = get_toolbox()
         self.tools = self.toolbox.get_tools()
+        # The toolbox is fixed for the engine's lifetime
+        self._tool_names = tuple(self.tools)
+        # Tools block on a CLAMS app subprocess, so run them off the event loop
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clams-tool")
+        # Concurrent pipelines share the GPU. GPU-bound tools get their own pool sized to
+        # the limit, so steps waiting for the GPU queue there instead of holding threads
+        # that CPU-only tools, cache copies and prewarm jobs need
+        self._gpu_pool = ThreadPoolExecutor(max_workers=max_gpu_tools, thread_name_prefix="clams-gpu-tool")
         
     async def execute_plan(self, 
                           plan: PipelinePlan, 
-                          input_mmif: str) -> AsyncGenerator[ExecutionProgress, None]:
+                          input_mmif: str,
+                          output_dir: Optional[str] = None) -> AsyncGenerator[ExecutionProgress, None]:
         """
         Execute a pipeline plan with progress streaming.
         
+        Steps run in a background task that reports into a bounded queue, so
+        heartbeats keep arriving while a long-running tool is still working.
+        
         Args:
             plan: The pipeline plan to execute
             input_mmif: Input MMIF data or file path
+            output_dir: Directory to write the final output MMIF to; the caller
+                owns the file. Without one, the engine keeps the last
+                output_retention outputs and deletes older ones.
             
         Yields:
-            ExecutionProgress updates during execution
+            ExecutionProgress updates during execution; the final "completed"
+            update carries the output file in output_path
         """
-        logger.info(f"Starting execution of plan {plan.plan_id}")
+        progress_q: asyncio.Queue = asyncio.Queue(maxsize=16)
+        
+        async def produce():
+            try:
+                await self._run_steps(plan, input_mmif, output_dir, progress_q)
+            except Exception as e:
+                logger.error("Pipeline execution failed: %s", e)
+            # End-of-stream marker (skipped on cancellation, when nobody is listening)
+            await progress_q.put(None)
+        
+        worker = asyncio.create_task(produce())
+        try:
+            while (progress := await progress_q.get()) is not None:
+                yield progress
+        finally:
+            # Stop the steps if the consumer goes away early
+            if not worker.done():
+                worker.cancel()
+    
+    async def _run_steps(self,
+                         plan: PipelinePlan,
+                         input_mmif: str,
+                         output_dir: Optional[str],
+                         progress_q: asyncio.Queue):
+        """Execute the plan's steps in order, reporting progress into the queue."""
+        logger.info("Starting execution of plan %s", plan.plan_id)
         
         step_results = []
         current_mmif = input_mmif
         total_steps = len(plan.steps)
-        start_time = datetime.now()
+        start_time = time.monotonic()
+        # Steps hand MMIF to each other through files here rather than in memory
+        work_dir = tempfile.mkdtemp(prefix="clams-pipeline-")
+        # Steps stop at the first failure, so there is at most one
+        failed_step = None
         
         try:
             for i, step in enumerate(plan.steps):
-                # Progress update: starting step
-                yield ExecutionProgress(
-                    current_step=i + 1,
-                    total_steps=total_steps,
-                    step_name=step.tool_name,
-                    status="starting",
-                    message=f"Initializing {step.tool_name}",
-                    percentage=(i / total_steps) * 100
-                )
+                # Prepare the next step's app while this one runs
+                if i + 1 < total_steps:
+                    self._pool.submit(self.toolbox.prewarm, plan.steps[i + 1].tool_name)
                 
                 # Execute the step
-                step_start = datetime.now()
-                yield ExecutionProgress(
+                step_start = time.monotonic()
+                step_start_wall = time.time()
+                await progress_q.put(ExecutionProgress(
                     current_step=i + 1,
                     total_steps=total_steps,
                     step_name=step.tool_name,
                     status="running",
                     message=f"Executing {step.tool_name}...",
                     percentage=((i + 0.5) / total_steps) * 100
-                )
+                ))
                 
                 try:
-                    result = await self._execute_step(step, current_mmif)
-                    step_end = datetime.now()
-                    result.execution_time = (step_end - step_start).total_seconds()
-                    result.end_time = step_end.isoformat()
+                    result = await self._execute_step_with_heartbeat(
+                        step, current_mmif, os.path.join(work_dir, f"step-{i + 1}.mmif"),
+                        i, total_steps, step_start, progress_q
+                    )
+                    result.execution_time = time.monotonic() - step_start
+                    result.start_time = step_start_wall
+                    result.end_time = step_start_wall + result.execution_time
                     
                     step_results.append(result)
                     
                     if result.success:
+                        # The previous intermediate output has now been consumed
+                        if current_mmif != input_mmif:
+                            os.unlink(current_mmif)
                         current_mmif = result.output
-                        yield ExecutionProgress(
+                        await progress_q.put(ExecutionProgress(
                             current_step=i + 1,
                             total_steps=total_steps,
                             step_name=step.tool_name,
                             status="completed",
                             message=f"✓ {step.tool_name} completed successfully",
                             percentage=((i + 1) / total_steps) * 100
-                        )
+                        ))
                     else:
-                        yield ExecutionProgress(
+                        failed_step = step.tool_name
+                        await progress_q.put(ExecutionProgress(
                             current_step=i + 1,
                             total_steps=total_steps,
                             step_name=step.tool_name,
                             status="failed",
                             message=f"✗ {step.tool_name} failed: {result.error}",
                             percentage=((i + 1) / total_steps) * 100
-                        )
+                        ))
                         break
                         
                 except Exception as e:
-                    logger.error(f"Step {step.tool_name} failed: {e}")
-                    step_end = datetime.now()
+                    logger.error("Step %s failed: %s", step.tool_name, e)
+                    execution_time = time.monotonic() - step_start
                     result = StepResult(
                         step=step,
                         success=False,
                         error=str(e),
-                        execution_time=(step_end - step_start).total_seconds(),
-                        end_time=step_end.isoformat()
+                        execution_time=execution_time,
+                        start_time=step_start_wall,
+                        end_time=step_start_wall + execution_time
                     )
                     step_results.append(result)
+                    failed_step = step.tool_name
                     
-                    yield ExecutionProgress(
+                    await progress_q.put(ExecutionProgress(
                         current_step=i + 1,
                         total_steps=total_steps,
                         step_name=step.tool_name,
                         status="failed",
                         message=f"✗ {step.tool_name} failed: {str(e)}",
                         percentage=((i + 1) / total_steps) * 100
-                    )
+                    ))
                     break
             
             # Final completion
-            end_time = datetime.now()
-            total_time = (end_time - start_time).total_seconds()
+            total_time = time.monotonic() - start_time
             
-            success = all(result.success for result in step_results)
-            if success:
-                yield ExecutionProgress(
+            if failed_step is None:
+                message = f"🎉 Pipeline completed successfully in {total_time:.1f}s"
+                final_output = None
+                if step_results:
+                    # Move the output out of the work dir before it is removed
+                    final_output = await self._keep_output(current_mmif, plan.plan_id, output_dir)
+                    message += f"; output MMIF: {final_output}"
+                await progress_q.put(ExecutionProgress(
                     current_step=total_steps,
                     total_steps=total_steps,
                     step_name="pipeline",
                     status="completed",
-                    message=f"🎉 Pipeline completed successfully in {total_time:.1f}s",
-                    percentage=100.0
-                )
+                    message=message,
+                    percentage=100.0,
+                    output_path=final_output
+                ))
             else:
-                failed_steps = [r.step.tool_name for r in step_results if not r.success]
-                yield ExecutionProgress(
+                await progress_q.put(ExecutionProgress(
                     current_step=total_steps,
                     total_steps=total_steps,
                     step_name="pipeline",
                     status="failed",
-                    message=f"❌ Pipeline failed at steps: {', '.join(failed_steps)}",
+                    message=f"❌ Pipeline failed at steps: {failed_step}",
                     percentage=100.0
-                )
+                ))
                 
         except Exception as e:
-            logger.error(f"Pipeline execution failed: {e}")
-            yield ExecutionProgress(
+            logger.error("Pipeline execution failed: %s", e)
+            await progress_q.put(ExecutionProgress(
                 current_step=0,
                 total_steps=total_steps,
                 step_name="pipeline",
                 status="failed",
                 message=f"❌ Pipeline execution failed: {str(e)}",
                 percentage=0.0
-            )
+            ))
+        finally:
+            # Intermediate outputs never outlive the run
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    async def _execute_step_with_heartbeat(self,
+                                           step: ToolStep,
+                                           input_mmif: str,
+                                           output_path: str,
+                                           index: int,
+                                           total_steps: int,
+                                           step_start: float,
+                                           progress_q: asyncio.Queue) -> StepResult:
+        """Execute a step, reporting a "running" heartbeat every heartbeat_interval seconds."""
+        task = asyncio.ensure_future(self._execute_step(step, input_mmif, output_path))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    return task.result()
+                elapsed = time.monotonic() - step_start
+                await progress_q.put(ExecutionProgress(
+                    current_step=index + 1,
+                    total_steps=total_steps,
+                    step_name=step.tool_name,
+                    status="running",
+                    message=f"{step.tool_name} still running ({elapsed:.0f}s)",
+                    percentage=((index + 0.5) / total_steps) * 100
+                ))
+        finally:
+            task.cancel()
     
-    async def _execute_step(self, step: ToolStep, input_mmif: str) -> StepResult:
-        """Execute a single pipeline step."""
-        logger.info(f"Executing step: {step.tool_name}")
+    async def _execute_step(self, step: ToolStep, input_mmif: str, output_path: str) -> StepResult:
+        """Execute a single pipeline step, writing its output MMIF to output_path."""
+        logger.info("Executing step: %s", step.tool_name)
         
         if step.tool_name not in self.tools:
             return StepResult(
@@ -219,28 +360,42 @@ class CLAMSExecutionEngine:
         tool = self.tools[step.tool_name]
         
         try:
-            # Convert parameters to JSON string if needed
-            parameters_json = json.dumps(step.parameters) if step.parameters else None
+            loop = asyncio.get_running_loop()
             
-            # Execute the tool
-            result = tool._run(
-                input_mmif=input_mmif,
-                config=step.config,
-                parameters=parameters_json
+            cache_key = None
+            if self.step_cache_size > 0 and getattr(tool, 'cacheable', True):
+                # Hashing reads the whole input MMIF, so keep it off the event loop too
+                cache_key = await loop.run_in_executor(self._pool, self._step_cache_key, step, input_mmif)
+                cached_output = self._step_cache.get(cache_key)
+                if cached_output is not None:
+                    self._step_cache.move_to_end(cache_key)
+                    try:
+                        await loop.run_in_executor(self._pool, shutil.copyfile, cached_output, output_path)
+                        logger.info("Reusing cached output for step: %s", step.tool_name)
+                        return StepResult(
+                            step=step,
+                            success=True,
+                            output=output_path
+                        )
+                    except OSError:
+                        # Evicted by a concurrent pipeline; just run the tool
+                        self._step_cache.pop(cache_key, None)
+            
+            # Execute the tool in the worker pool so progress and other requests keep flowing.
+            # run_mmif raises on failure, so the output MMIF is passed on without parsing it.
+            result = await loop.run_in_executor(
+                self._gpu_pool if tool.uses_gpu else self._pool,
+                functools.partial(
+                    tool.run_mmif,
+                    input_mmif=input_mmif,
+                    config=step.config,
+                    parameters=step.parameters or None,
+                    output_path=output_path
+                )
             )
             
-            # Check if result indicates an error
-            try:
-                result_data = json.loads(result)
-                if isinstance(result_data, dict) and "error" in result_data:
-                    return StepResult(
-                        step=step,
-                        success=False,
-                        error=result_data["error"]
-                    )
-            except json.JSONDecodeError:
-                # Result is not JSON, treat as successful MMIF output
-                pass
+            if cache_key is not None:
+                await self._cache_step_output(cache_key, result)
             
             return StepResult(
                 step=step,
@@ -249,16 +404,72 @@ class CLAMSExecutionEngine:
             )
             
         except Exception as e:
-            logger.error(f"Tool execution failed: {e}")
+            logger.error("Tool execution failed: %s", e)
             return StepResult(
                 step=step,
                 success=False,
                 error=str(e)
             )
     
+    @staticmethod
+    def _step_cache_key(step: ToolStep, input_mmif: str) -> str:
+        """Hash everything that determines a step's output: tool, config, parameters and input."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (step.tool_name, step.config or '', step.parameters_json):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        if os.path.isfile(input_mmif):
+            with open(input_mmif, 'rb') as f:
+                for chunk in iter(functools.partial(f.read, 1 << 20), b''):
+                    digest.update(chunk)
+        else:
+            digest.update(input_mmif.encode('utf-8'))
+        return digest.hexdigest()
+    
+    async def _cache_step_output(self, cache_key: str, output_path: str):
+        """Keep a copy of a step's output file, evicting the least recently used ones."""
+        if self._step_cache_dir is None:
+            self._step_cache_dir = tempfile.TemporaryDirectory(prefix="clams-step-cache-")
+        cached_output = os.path.join(self._step_cache_dir.name, f"{cache_key}.mmif")
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._pool, shutil.copyfile, output_path, cached_output)
+        self._step_cache[cache_key] = cached_output
+        self._step_cache.move_to_end(cache_key)
+        
+        while len(self._step_cache) > self.step_cache_size:
+            _, evicted = self._step_cache.popitem(last=False)
+            try:
+                os.unlink(evicted)
+            except OSError:
+                pass
+    
+    async def _keep_output(self, path: str, plan_id: str, output_dir: Optional[str]) -> str:
+        """Move a pipeline's final output out of its work dir and return the new path."""
+        loop = asyncio.get_running_loop()
+        if output_dir is not None:
+            # The caller owns the file from here on
+            await loop.run_in_executor(self._pool, functools.partial(os.makedirs, output_dir, exist_ok=True))
+            return await loop.run_in_executor(self._pool, shutil.move, path,
+                                              os.path.join(output_dir, f"{plan_id}.mmif"))
+        
+        # Engine-owned outputs: keep the most recent few, removed along with the engine
+        if self._output_dir is None:
+            self._output_dir = tempfile.TemporaryDirectory(prefix="clams-outputs-")
+        kept = os.path.join(self._output_dir.name, f"{plan_id}-{uuid.uuid4().hex[:8]}.mmif")
+        await loop.run_in_executor(self._pool, shutil.move, path, kept)
+        self._outputs.append(kept)
+        
+        while len(self._outputs) > self.output_retention:
+            try:
+                os.unlink(self._outputs.popleft())
+            except OSError:
+                pass
+        return kept
+    
     def get_available_tools(self) -> List[str]:
         """Get list of available tool names."""
-        return list(self.tools.keys())
+        return list(self._tool_names)
     
     def validate_plan(self, plan: PipelinePlan) -> List[str]:
         """Validate a pipeline plan and return any issues."""
@@ -5,10 +5,20 @@ that can be used by both the chat interface and visual pipeline editor.
 """
 
 import os
+import copy
+import itertools
 import json
 import yaml
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Union
 
+# Use the libyaml bindings when PyYAML was built with them
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
 
 class PipelineModel:
     """
@@ -27,6 +37,22 @@ class PipelineModel:
         self.nodes = []  # List of tools in the pipeline
         self.edges = []  # List of connections between tools
     
+    @property
+    def edges(self) -> List[Dict[str, Any]]:
+        """Connections between tools; replace the list (not its items) to change them outside add_edge."""
+        return self._edges
+    
+    @edges.setter
+    def edges(self, edges: List[Dict[str, Any]]):
+        self._edges = edges
+        # (source, target) -> edge ID, to find duplicates quickly; the first edge wins.
+        # Hand-written or older files may have incomplete edges, which are kept but not indexed.
+        self._edge_ids = {}
+        for edge in edges:
+            source, target = edge.get("source"), edge.get("target")
+            if source is not None and target is not None:
+                self._edge_ids.setdefault((source, target), edge.get("id", f"{source}-{target}"))
+    
     def add_node(self, tool_id: str, tool_data: Dict[str, Any], position: Dict[str, float] = None) -> str:
         """
         Add a tool node to the pipeline.
@@ -67,9 +93,9 @@ class PipelineModel:
         edge_id = f"{source_id}-{target_id}"
         
         # Check if edge already exists
-        for edge in self.edges:
-            if edge["source"] == source_id and edge["target"] == target_id:
-                return edge["id"]
+        existing_id = self._edge_ids.get((source_id, target_id))
+        if existing_id is not None:
+            return existing_id
         
         edge = {
             "id": edge_id,
@@ -78,6 +104,7 @@ class PipelineModel:
         }
         
         self.edges.append(edge)
+        self._edge_ids[(source_id, target_id)] = edge_id
         return edge_id
     
     def clear(self):
@@ -121,8 +148,7 @@ class PipelineModel:
         Returns:
             YAML string representation of the pipeline
         """
-        pipeline_dict = self.to_dict()
-        return yaml.dump(pipeline_dict, default_flow_style=False)
+        return self._dump_yaml()
     
     def save_yaml(self, filepath: str):
         """
@@ -132,7 +158,14 @@ class PipelineModel:
             filepath: Path to save the YAML file
         """
         with open(filepath, 'w') as f:
-            f.write(self.to_yaml())
+            # Emit straight into the file rather than building the whole document first
+            self._dump_yaml(f)
+    
+    def _dump_yaml(self, stream=None) -> Optional[str]:
+        """Dump the pipeline as YAML to a stream, or return it as a string if none is given."""
+        pipeline_dict = self.to_dict()
+        # Keep to_dict's order so scalar fields like the name lead the file (see peek_header)
+        return yaml.dump(pipeline_dict, stream, Dumper=_YamlDumper, default_flow_style=False, sort_keys=False)
     
     @classmethod
     def from_yaml(cls, yaml_str: str) -> 'PipelineModel':
@@ -145,7 +178,7 @@ class PipelineModel:
         Returns:
             New PipelineModel instance
         """
-        data = yaml.safe_load(yaml_str)
+        data = yaml.load(yaml_str, Loader=_YamlLoader)
         return cls.from_dict(data)
     
     @classmethod
@@ -161,6 +194,44 @@ class PipelineModel:
         """
         with open(filepath, 'r') as f:
             return cls.from_yaml(f.read())
+    
+    @classmethod
+    def peek_header(cls, filepath: str, max_lines: int = 16) -> Dict[str, Any]:
+        """
+        Read a pipeline file's top-level scalar fields without parsing its nodes and edges.
+        
+        Files written by to_yaml lead with their scalar fields (name first), so
+        only the lines before the first block-valued key are parsed. Files that
+        don't follow that layout are parsed in full.
+        
+        Args:
+            filepath: Path to the YAML file
+            max_lines: Most lines to read before falling back to a full parse
+            
+        Returns:
+            Top-level fields other than nodes and edges
+        """
+        header_lines = []
+        with open(filepath, 'r') as f:
+            for line in itertools.islice(f, max_lines):
+                # A top-level "key:" with nothing after it opens the node/edge lists
+                if line.startswith('-') or (not line[:1].isspace() and line.rstrip().endswith(':')):
+                    break
+                header_lines.append(line)
+            else:
+                if len(header_lines) == max_lines:
+                    # The header may continue past what was read
+                    header_lines = []
+        
+        try:
+            header = yaml.load(''.join(header_lines), Loader=_YamlLoader)
+        except yaml.YAMLError:
+            header = None
+        if isinstance(header, dict) and 'name' in header:
+            return {key: value for key, value in header.items() if key not in ('nodes', 'edges')}
+        
+        data = cls.load_yaml(filepath).to_dict()
+        return {key: value for key, value in data.items() if key not in ('nodes', 'edges')}
 
 
 class PipelineStore:
@@ -177,6 +248,10 @@ class PipelineStore:
         """
         self.storage_dir = storage_dir
         os.makedirs(storage_dir, exist_ok=True)
+        
+        # Absolute path -> (mtime_ns, size, pipeline) for recently loaded files
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_size = 64
     
     def save_pipeline(self, pipeline: PipelineModel, name: Optional[str] = None) -> str:
         """
@@ -197,6 +272,7 @@ class PipelineStore:
         filepath = os.path.join(self.storage_dir, filename)
         
         pipeline.save_yaml(filepath)
+        self._cache.pop(os.path.abspath(filepath), None)
         return filepath
     
     def load_pipeline(self, name_or_path: str) -> PipelineModel:
@@ -210,17 +286,56 @@ class PipelineStore:
             Loaded pipeline
         """
         if os.path.isfile(name_or_path):
-            return PipelineModel.load_yaml(name_or_path)
+            return self._load_cached(name_or_path)
             
         # Try to find by name
         filename = name_or_path.lower().replace(" ", "_") + ".yaml"
         filepath = os.path.join(self.storage_dir, filename)
         
         if os.path.isfile(filepath):
-            return PipelineModel.load_yaml(filepath)
+            return self._load_cached(filepath)
             
         raise FileNotFoundError(f"Pipeline not found: {name_or_path}")
     
+    def _load_cached(self, filepath: str) -> PipelineModel:
+        """Load a pipeline file, reusing the parsed copy while the file is unchanged."""
+        key = os.path.abspath(filepath)
+        st = os.stat(key)
+        
+        cached = self._cache.get(key)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            self._cache.move_to_end(key)
+            pipeline = cached[2]
+        else:
+            pipeline = PipelineModel.load_yaml(key)
+            self._cache[key] = (st.st_mtime_ns, st.st_size, pipeline)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        
+        # Callers may edit what they load, so never hand out the cached instance
+        return copy.deepcopy(pipeline)
+    
+    def list_pipeline_summaries(self) -> List[Dict[str, Any]]:
+        """
+        List all available pipelines with their stored names, without loading their nodes.
+        
+        Returns:
+            List of {"name": ..., "file": ...} entries
+        """
+        filenames = self._pipeline_filenames()
+        paths = [os.path.join(self.storage_dir, filename) for filename in filenames]
+        
+        if len(paths) >= 8:
+            # Reading headers is file I/O, so overlap it across threads
+            with ThreadPoolExecutor(max_workers=min(16, len(paths))) as pool:
+                headers = list(pool.map(PipelineModel.peek_header, paths))
+        else:
+            headers = [PipelineModel.peek_header(path) for path in paths]
+        
+        return [{"name": header.get("name"), "file": filename}
+                for filename, header in zip(filenames, headers)]
+    
     def list_pipelines(self) -> List[str]:
         """
         List all available pipelines.
@@ -228,9 +343,11 @@ class PipelineStore:
         Returns:
             List of pipeline names
         """
-        pipelines = []
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith(".yaml"):
-                pipeline_name = filename[:-5].replace("_", " ").title()
-                pipelines.append(pipeline_name)
-        return pipelines 
\ No newline at end of file
+        return [filename[:-5].replace("_", " ").title() for filename in self._pipeline_filenames()]
+    
+    def _pipeline_filenames(self) -> List[str]:
+        """Names of the pipeline files in the storage directory."""
+        # scandir's entries carry the file type, so no extra stat per file
+        with os.scandir(self.storage_dir) as entries:
+            return [entry.name for entry in entries
+                    if entry.name.endswith(".yaml") and entry.is_file()] 
\ No newline at end of file
@@ -4,20 +4,37 @@ Generates structured pipeline plans through conversational interaction.
 """
 
 from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import copy
+import functools
 import json
 import logging
 import re
-from langchain_ollama import ChatOllama
-from langchain_core.messages import SystemMessage, HumanMessage
+import uuid
+from datetime import datetime
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 
 from .pipeline_execution import PipelinePlan, ToolStep
-from .clams_tools import CLAMSToolbox
+from .clams_tools import get_toolbox
 from .config import ConfigManager
+from .llm_factory import create_chat_model
 
 logger = logging.getLogger(__name__)
 
+# Number of plans kept for repeats of a query (ignoring case and whitespace)
+PLAN_CACHE_SIZE = 128
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Keyword pattern -> tool step for heuristic plans; keywords match anywhere in the query
+_FALLBACK_RULES = (
+    (re.compile(r'speech|spoken|audio|transcribe'), 'whisper-wrapper', 'Extract spoken text from audio'),
+    (re.compile(r'text|ocr|read|visual'), 'easyocr-wrapper', 'Extract text from video frames'),
+    (re.compile(r'scene|shot|segment'), 'swt-detection', 'Detect scenes and segments'),
+)
+
 class PipelinePlanOutput(BaseModel):
     """Pydantic model for structured pipeline plan output."""
     steps: List[Dict[str, Any]] = Field(description="List of pipeline steps with tool_name, parameters, config, and reasoning")
@@ -27,6 +44,11 @@ class PipelinePlanOutput(BaseModel):
     output_types: List[str] = Field(description="Expected output types (e.g., ['TextDocument', 'Alignment'])")
     estimated_time: int = Field(description="Estimated total execution time in seconds")
 
+@functools.lru_cache(maxsize=1)
+def _plan_output_parser() -> PydanticOutputParser:
+    """Parser for PipelinePlanOutput, shared by all planning agents."""
+    return PydanticOutputParser(pydantic_object=PipelinePlanOutput)
+
 class CLAMSPlanningAgent:
     """Enhanced planning agent that generates structured pipeline plans."""
     
@@ -36,75 +58,39 @@ class CLAMSPlanningAgent:
         self.llm_config = self.config_manager.get_config().llm
         
         # Initialize LLM
-        if self.llm_config.provider == "ollama":
-            self.llm = ChatOllama(
-                model=self.llm_config.model_name,
-                base_url=self.llm_config.base_url,
-                temperature=self.llm_config.temperature,
-                top_p=self.llm_config.top_p
-            )
-        else:
-            from langchain_openai import ChatOpenAI
-            self.llm = ChatOpenAI(
-                model=self.llm_config.model_name,
-                temperature=self.llm_config.temperature
-            )
+        self.llm = create_chat_model(self.llm_config)
         
         # Initialize tools and metadata
-        self.toolbox = CLAMSToolbox()
-        self.tool_metadata = self._initialize_tool_metadata()
+        self.toolbox = get_toolbox()
+        self.tool_metadata = self.toolbox.tool_metadata
         
         # Set up output parser
-        self.output_parser = PydanticOutputParser(pydantic_object=PipelinePlanOutput)
-    
-    def _initialize_tool_metadata(self) -> Dict[str, Any]:
-        """Initialize tool metadata for pipeline planning."""
-        metadata = {}
-        
-        for tool_name, clams_tool in self.toolbox.get_tools().items():
-            app_info = clams_tool.app_metadata
-            tool_metadata = app_info.get('metadata', {})
-            
-            # Extract and clean input/output types
-            input_types = self._extract_types(tool_metadata.get('input', []))
-            output_types = self._extract_types(tool_metadata.get('output', []))
-            
-            metadata[tool_name] = {
-                'description': tool_metadata.get('description', ''),
-                'input_types': input_types,
-                'output_types': output_types,
-                'parameters': tool_metadata.get('parameters', []),
-                'app_version': tool_metadata.get('app_version', 'unknown')
-            }
+        self.output_parser = _plan_output_parser()
         
-        return metadata
+        # Normalized query -> plan built from a well-formed LLM response
+        self._plan_cache: "OrderedDict[str, PipelinePlan]" = OrderedDict()
     
-    def _extract_types(self, type_list: List[Dict[str, Any]]) -> List[str]:
-        """Extract clean type names from MMIF type URIs."""
-        types = []
-        for type_info in type_list:
-            if isinstance(type_info, dict) and '@type' in type_info:
-                type_uri = type_info['@type']
-                # Extract clean type name
-                type_name = type_uri.split('/')[-1]
-                # Remove version numbers
-                clean_name = type_name.split('v')[0] if 'v' in type_name else type_name
-                if clean_name:
-                    types.append(clean_name)
-        return types
+    def _create_planning_messages(self, user_query: str) -> List[BaseMessage]:
+        """Create the planning prompt: static instructions first, then the user's request."""
+        return [self._planning_system_message, HumanMessage(content=f"""User Request: {user_query}
+
+Create a structured pipeline plan that addresses the user's request:""")]
     
-    def _create_planning_prompt(self, user_query: str) -> str:
-        """Create a comprehensive planning prompt."""
+    @functools.cached_property
+    def _planning_system_message(self) -> SystemMessage:
+        """The planning instructions, which are identical for every request.
+        
+        Built once per agent. Keeping them ahead of the user's request lets the
+        model server reuse its cached prefix across planning calls.
+        """
         tool_descriptions = self._get_tool_descriptions()
         
         format_instructions = self.output_parser.get_format_instructions()
         
-        return f"""You are a CLAMS (Computational Language and Audiovisual Multimedia Systems) pipeline expert.
+        return SystemMessage(content=f"""You are a CLAMS (Computational Language and Audiovisual Multimedia Systems) pipeline expert.
 
 Your task is to analyze the user's request and create a structured pipeline plan using available CLAMS tools.
 
-User Request: {user_query}
-
 Available CLAMS Tools:
 {tool_descriptions}
 
@@ -129,24 +115,11 @@ Confidence Scoring:
 - 0.4: Partial match, significant limitations
 - 0.2: Poor match, major issues or missing capabilities
 
-{format_instructions}
-
-Create a structured pipeline plan that addresses the user's request:"""
+{format_instructions}""")
     
     def _get_tool_descriptions(self) -> str:
         """Get formatted descriptions of all available tools."""
-        descriptions = []
-        
-        for tool_name, metadata in self.tool_metadata.items():
-            input_types = ", ".join(metadata['input_types']) if metadata['input_types'] else "Any"
-            output_types = ", ".join(metadata['output_types']) if metadata['output_types'] else "Various"
-            
-            descriptions.append(
-                f"- {tool_name}: {metadata['description']}\n"
-                f"  Input: {input_types} | Output: {output_types}"
-            )
-        
-        return "\n".join(descriptions)
+        return self.toolbox.tool_descriptions
     
     async def suggest_pipeline(self, user_query: str) -> PipelinePlan:
         """
@@ -160,18 +133,24 @@ Create a structured pipeline plan that addresses the user's request:"""
         """
         logger.info(f"Planning pipeline for query: {user_query}")
         
+        cache_key = _WHITESPACE_RE.sub(' ', user_query.strip().lower())
+        cached_plan = self._cached_plan(cache_key)
+        if cached_plan is not None:
+            return cached_plan
+        
         try:
             # Create planning prompt
-            prompt = self._create_planning_prompt(user_query)
+            messages = self._create_planning_messages(user_query)
             
             # Get LLM response
-            messages = [HumanMessage(content=prompt)]
             response = await self.llm.ainvoke(messages)
             
             # Parse structured output
+            structured = True
             try:
                 parsed_output = self.output_parser.parse(response.content)
             except Exception as e:
+                structured = False
                 logger.warning(f"Failed to parse structured output: {e}")
                 # Fallback to manual parsing
                 parsed_output = self._fallback_parse(response.content, user_query)
@@ -179,8 +158,10 @@ Create a structured pipeline plan that addresses the user's request:"""
             # Convert to PipelinePlan
             steps = []
             for step_data in parsed_output.steps:
+                tool_name = step_data.get('tool_name', '')
                 step = ToolStep(
-                    tool_name=step_data.get('tool_name', ''),
+                    # Unknown names are kept as written so validation can report them
+                    tool_name=self.toolbox.resolve_tool_name(tool_name) or tool_name,
                     parameters=step_data.get('parameters', {}),
                     config=step_data.get('config'),
                     reasoning=step_data.get('reasoning', ''),
@@ -198,6 +179,10 @@ Create a structured pipeline plan that addresses the user's request:"""
             )
             
             logger.info(f"Generated plan with {len(steps)} steps, confidence: {plan.confidence}")
+            if structured:
+                self._plan_cache[cache_key] = copy.deepcopy(plan)
+                if len(self._plan_cache) > PLAN_CACHE_SIZE:
+                    self._plan_cache.popitem(last=False)
             return plan
             
         except Exception as e:
@@ -205,6 +190,23 @@ Create a structured pipeline plan that addresses the user's request:"""
             # Return a fallback plan
             return self._create_fallback_plan(user_query, str(e))
     
+    def _cached_plan(self, cache_key: str) -> Optional[PipelinePlan]:
+        """Return a fresh copy of the plan cached for a query, if its tools are all still available."""
+        plan = self._plan_cache.get(cache_key)
+        if plan is None:
+            return None
+        if not all(step.tool_name in self.tool_metadata for step in plan.steps):
+            del self._plan_cache[cache_key]
+            return None
+        
+        self._plan_cache.move_to_end(cache_key)
+        logger.info(f"Reusing cached plan for query: {cache_key}")
+        # Each suggestion is its own plan, free to edit and with its own id
+        plan = copy.deepcopy(plan)
+        plan.plan_id = str(uuid.uuid4())
+        plan.created_at = datetime.now().isoformat()
+        return plan
+    
     def _fallback_parse(self, response_content: str, user_query: str) -> PipelinePlanOutput:
         """Fallback parsing when structured output fails."""
         logger.info("Using fallback parsing for pipeline plan")
@@ -215,29 +217,15 @@ Create a structured pipeline plan that addresses the user's request:"""
         reasoning = f"Fallback plan for: {user_query}"
         
         # Common patterns
-        if any(word in user_query.lower() for word in ['speech', 'spoken', 'audio', 'transcribe']):
-            steps.append({
-                'tool_name': 'whisper-wrapper',
-                'parameters': {},
-                'config': None,
-                'reasoning': 'Extract spoken text from audio'
-            })
-        
-        if any(word in user_query.lower() for word in ['text', 'ocr', 'read', 'visual']):
-            steps.append({
-                'tool_name': 'easyocr-wrapper',
-                'parameters': {},
-                'config': None,
-                'reasoning': 'Extract text from video frames'
-            })
-        
-        if any(word in user_query.lower() for word in ['scene', 'shot', 'segment']):
-            steps.append({
-                'tool_name': 'swt-detection',
-                'parameters': {},
-                'config': None,
-                'reasoning': 'Detect scenes and segments'
-            })
+        query = user_query.lower()
+        for keywords, tool_name, step_reasoning in _FALLBACK_RULES:
+            if keywords.search(query):
+                steps.append({
+                    'tool_name': tool_name,
+                    'parameters': {},
+                    'config': None,
+                    'reasoning': step_reasoning
+                })
         
         if not steps:
             # Default pipeline
@@ -287,8 +275,20 @@ Create a structured pipeline plan that addresses the user's request:"""
             Conversational explanation of the suggested pipeline
         """
         plan = await self.suggest_pipeline(user_query)
+        return self.describe_plan(plan, user_query)
+    
+    def describe_plan(self, plan: PipelinePlan, user_query: str) -> str:
+        """
+        Format an already generated plan as a conversational explanation.
         
-        explanation = f"""Based on your request: "{user_query}"
+        Args:
+            plan: Pipeline plan to describe
+            user_query: User's request the plan was generated for
+            
+        Returns:
+            Conversational explanation of the pipeline plan
+        """
+        parts = [f"""Based on your request: "{user_query}"
 
 I suggest the following pipeline approach:
 
@@ -296,21 +296,22 @@ I suggest the following pipeline approach:
 {plan.reasoning}
 
 **Execution Steps:**
-"""
+"""]
         
         for i, step in enumerate(plan.steps, 1):
-            explanation += f"{i}. **{step.tool_name}**: {step.reasoning}\n"
+            parts.append(f"{i}. **{step.tool_name}**: {step.reasoning}\n")
             if step.parameters:
-                explanation += f"   Parameters: {step.parameters}\n"
+                parts.append(f"   Parameters: {step.parameters}\n")
             if step.config:
-                explanation += f"   Configuration: {step.config}\n"
-            explanation += "\n"
+                parts.append(f"   Configuration: {step.config}\n")
+            parts.append("\n")
         
-        explanation += f"""
-**Estimated Time:** {plan.estimated_total_time // 60} minutes {plan.estimated_total_time % 60} seconds
+        minutes, seconds = divmod(plan.estimated_total_time, 60)
+        parts.append(f"""
+**Estimated Time:** {minutes} minutes {seconds} seconds
 **Confidence:** {plan.confidence:.1%}
 
 Would you like me to execute this pipeline, or would you prefer to modify any steps?
-"""
+""")
         
-        return explanation
\ No newline at end of file
+        return "".join(parts)
\ No newline at end of file
@@ -125,6 +125,8 @@ export const Chat: React.FC<ChatProps> = ({ onPipelineGenerated }) => {
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const videoRef = useRef<HTMLVideoElement>(null);
   const eventSourceRef = useRef<EventSource | null>(null);
+  // True while the last assistant message is still being built from streamed tokens
+  const pendingTokensRef = useRef(false);
 
   // Auto-scroll to bottom when messages change
   useEffect(() => {
@@ -238,15 +240,43 @@ export const Chat: React.FC<ChatProps> = ({ onPipelineGenerated }) => {
         break;
         
       // Legacy events for backward compatibility
+      case 'assistant_token':
+        // Append the chunk to the pending assistant message, starting one if needed
+        const appendToPending = pendingTokensRef.current;
+        pendingTokensRef.current = true;
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          if (appendToPending && last && last.role === 'assistant') {
+            return [...prev.slice(0, -1), { ...last, content: last.content + (content.content || '') }];
+          }
+          return [
+            ...prev,
+            {
+              role: 'assistant',
+              content: content.content || '',
+              timestamp: update.timestamp || new Date().toISOString()
+            }
+          ];
+        });
+        setStreaming(true);
+        break;
+        
       case 'assistant_message':
-        setMessages(prev => [
-          ...prev,
-          {
+        // The complete message replaces the one built from its tokens
+        const replacePending = pendingTokensRef.current;
+        pendingTokensRef.current = false;
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          const message = {
             role: 'assistant',
             content: content.content || content.message || '',
             timestamp: update.timestamp || new Date().toISOString()
+          };
+          if (replacePending && last && last.role === 'assistant') {
+            return [...prev.slice(0, -1), { ...message, timestamp: last.timestamp }];
           }
-        ]);
+          return [...prev, message];
+        });
         setStreaming(false);
         break;
         
@@ -299,11 +329,13 @@ export const Chat: React.FC<ChatProps> = ({ onPipelineGenerated }) => {
         break;
         
       case 'conversation_complete':
+        pendingTokensRef.current = false;
         setStreaming(false);
         setLoading(false);
         break;
         
       case 'error':
+        pendingTokensRef.current = false;
         setError(content.error || content.message || 'Unknown error');
         setStreaming(false);
         setLoading(false);